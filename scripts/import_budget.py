@@ -0,0 +1,101 @@
+"""Check the startup import cost of the CLI entry points.
+
+Every task in a workflow starts a fresh ``catask`` process, so whatever the CLI
+imports before parsing its arguments is paid once per task. This runs each entry
+point, and the ``catask aggregate`` command every aggregation task resolves,
+under ``python -X importtime``. It fails if the import time of an entry point is
+over budget, or if resolving a task command imports Jobmon. Import times depend
+on the machine, so this isn't part of the test suite; ``tests/test_cli.py``
+checks which modules are imported.
+
+Usage: python scripts/import_budget.py [--budget-ms 300] [--repeats 5]
+"""
+
+import argparse
+import subprocess
+import sys
+
+ENTRY_POINTS = ["carun", "catask"]
+# Task commands that should load without Jobmon, which only launchers use.
+TASK_COMMANDS = ["aggregate"]
+
+
+def import_times(code: str) -> tuple[int, dict[str, int]]:
+    """Run code in a fresh interpreter and time each module import.
+
+    Returns the total import time and a mapping from module name to its
+    cumulative import time, both in microseconds.
+    """
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    times = {}
+    # Lines look like "import time: self [us] | cumulative | imported package",
+    # with nested imports indented under the module that imported them.
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if not name.startswith("  "):
+            total += int(cumulative)
+        times[name.strip()] = int(cumulative)
+    return total, times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=300.0,
+        help="Maximum total import time of each entry point in milliseconds.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="Number of runs per entry point. The fastest run is checked.",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for entry_point in ENTRY_POINTS:
+        code = (
+            f"from rra_climate_aggregates.cli import {entry_point}; "
+            f"{entry_point}.list_commands(None)"
+        )
+        total, best = min(
+            (import_times(code) for _ in range(args.repeats)),
+            key=lambda run: run[0],
+        )
+        total_ms = total / 1000
+
+        slowest = sorted(best.items(), key=lambda item: item[1], reverse=True)[:5]
+
+        print(f"{entry_point}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        for name, t in slowest:
+            print(f"  {t / 1000:8.1f} ms  {name}")
+        if total_ms > args.budget_ms:
+            failed = True
+
+    for command in TASK_COMMANDS:
+        code = (
+            "from rra_climate_aggregates.cli import catask; "
+            f"catask.get_command(None, {command!r})"
+        )
+        total, times = import_times(code)
+        jobmon = "rra_tools.jobmon" in times
+        status = "imports rra_tools.jobmon" if jobmon else "ok"
+        print(f"catask {command}: {total / 1000:.1f} ms, {status}")
+        if jobmon:
+            failed = True
+
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Rewrite a version's raw results and population in the compact format.
+
+Raw results written before they had an explicit schema are still readable, but
+are larger and slower to filter. This rewrites them in place, with the same
+schema, sorting and compression new results are written with. Files that are
+already compact are left alone, so it's safe to rerun.
+
+Usage: python scripts/migrate_raw_results.py VERSION [--output-dir DIR]
+    [--compression zstd] [--compression-level 9]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from rra_climate_aggregates import constants as cac
+from rra_climate_aggregates.data import ClimateAggregateData
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("version", help="The version to migrate.")
+    parser.add_argument(
+        "--output-dir",
+        default=str(cac.MODEL_ROOT),
+        help="Root directory of the climate aggregates.",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=cac.PARQUET_COMPRESSIONS,
+        default=cac.PARQUET_COMPRESSION,
+        help="Compression codec to rewrite files with.",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=None,
+        help=(
+            "Compression level of the codec. Defaults to "
+            f"{cac.PARQUET_COMPRESSION_LEVEL} for {cac.PARQUET_COMPRESSION}."
+        ),
+    )
+    args = parser.parse_args()
+
+    if not Path(args.output_dir, args.version).exists():
+        parser.error(f"No version {args.version} in {args.output_dir}")
+    try:
+        ca_data = ClimateAggregateData(
+            args.output_dir, args.compression, args.compression_level
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    migrated = ca_data.migrate_raw_results(args.version)
+    print(f"Rewrote {migrated} files in the compact format")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
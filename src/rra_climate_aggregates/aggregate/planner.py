@@ -0,0 +1,276 @@
+import math
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+import rasterio
+
+from rra_climate_aggregates import constants as cac
+from rra_climate_aggregates.aggregate import utils
+from rra_climate_aggregates.data import (
+    ClimateAggregateData,
+    ClimateData,
+    PopulationModelData,
+)
+
+# Prior cost model, used as-is until we have telemetry to calibrate against.
+# Memory is dominated by the full-resolution rasters we hold at once (the mask
+# template, the mask, and a year of population) plus the decoded climate data.
+MEMORY_BASE = 2 * 2**30
+MEMORY_PER_PIXEL = 16
+MEMORY_PER_NETCDF_BYTE = 4
+# Runtime is dominated by decoding a population raster every year and reducing
+# it by location. Sub-annual time steps are reduced against per-location climate
+# pixel weights, so their cost scales with the climate data rather than the
+# population grid. Building the location masks scales with the area of the
+# location bounding boxes.
+RUNTIME_BASE = 5 * 60
+RUNTIME_PER_PIXEL_YEAR = 3e-8
+RUNTIME_PER_BBOX_PIXEL = 5e-8
+RUNTIME_PER_NETCDF_BYTE = 1e-8
+
+# Headroom over the calibrated estimate, and the granularity we round requests
+# to so tasks fall into a handful of resource groups.
+SAFETY_MARGIN = 1.25
+MEMORY_STEP_GB = 5
+RUNTIME_STEP_MINUTES = 30
+
+JOB_COLUMNS = ["scenario", "measure", "draw", "hierarchy"]
+
+
+def build_features(
+    jobs: Sequence[tuple[str, str, str, str]],
+    time_resolution: str,
+    pm_data: PopulationModelData,
+    cd_data: ClimateData,
+) -> pd.DataFrame:
+    """Collect the inputs to the cost model for each aggregation job.
+
+    Parameters
+    ----------
+    jobs
+        The (scenario, measure, draw, hierarchy) tuples to plan.
+    time_resolution
+        The time resolution of the climate data to aggregate.
+    pm_data
+        PopulationModelData object to read raster and shape metadata from.
+    cd_data
+        ClimateData object to locate the climate inputs.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per job with the raster size in pixels, the summed area of the
+        location bounding boxes in pixels, the size in bytes and number of the
+        climate input files, the number of years processed, and the maximum
+        number of time steps per year.
+    """
+    with rasterio.open(pm_data.results_path("2020q1")) as template:
+        pixels = template.width * template.height
+        hierarchy_bbox_pixels = {}
+        for hierarchy in {h for *_, h in jobs}:
+            raking_shapes = pm_data.load_raking_shapes(hierarchy)
+            shape_values = list(
+                zip(raking_shapes.geometry, raking_shapes.location_id, strict=True)
+            )
+            bounds_map = utils.build_bounds_map(template, shape_values)
+            hierarchy_bbox_pixels[hierarchy] = utils.bbox_pixels(bounds_map)
+
+    if time_resolution == "annual":
+        netcdf_files = 1
+        netcdf_bytes = {
+            (s, m, d): cd_data.annual_results_path(s, m, d).stat().st_size
+            for s, m, d, _ in set(jobs)
+        }
+    else:
+        # Sub-annual data is stored a year per file; assume the first is typical.
+        netcdf_files = len(cac.YEARS)
+        netcdf_bytes = {
+            (s, m, d): cd_data.subannual_results_path(
+                time_resolution, s, m, d, cac.YEARS[0]
+            )
+            .stat()
+            .st_size
+            for s, m, d, _ in set(jobs)
+        }
+
+    features = pd.DataFrame(list(jobs), columns=JOB_COLUMNS)
+    features["pixels"] = pixels
+    features["bbox_pixels"] = features.hierarchy.map(hierarchy_bbox_pixels)
+    features["netcdf_bytes"] = [netcdf_bytes[(s, m, d)] for s, m, d, _ in jobs]
+    features["netcdf_files"] = netcdf_files
+    features["years"] = len(cac.YEARS)
+    features["time_steps"] = cac.TIME_RESOLUTIONS[time_resolution]
+    return features
+
+
+def predict_memory(features: pd.DataFrame) -> pd.Series:  # type: ignore[type-arg]
+    """Predict peak task memory in bytes from the prior cost model."""
+    return (
+        MEMORY_BASE
+        + MEMORY_PER_PIXEL * features.pixels
+        + MEMORY_PER_NETCDF_BYTE * features.netcdf_bytes
+    )
+
+
+def predict_runtime(features: pd.DataFrame) -> pd.Series:  # type: ignore[type-arg]
+    """Predict task runtime in seconds from the prior cost model."""
+    return (
+        RUNTIME_BASE
+        + RUNTIME_PER_PIXEL_YEAR * features.pixels * features.years
+        + RUNTIME_PER_BBOX_PIXEL * features.bbox_pixels
+        + RUNTIME_PER_NETCDF_BYTE * features.netcdf_bytes * features.netcdf_files
+    )
+
+
+def calibration_factors(telemetry: pd.DataFrame) -> tuple[float, float]:
+    """Compute how far the prior cost model is off from completed tasks.
+
+    Parameters
+    ----------
+    telemetry
+        Records of completed tasks with the cost model features along with the
+        observed peak memory (in bytes) and runtime (in seconds).
+
+    Returns
+    -------
+    tuple[float, float]
+        Multipliers for the memory and runtime predictions. We use the 95th
+        percentile of observed / predicted so that the estimates cover nearly all
+        tasks we've seen. Both are 1 if there is no telemetry.
+    """
+    if telemetry.empty:
+        return 1.0, 1.0
+    memory_ratio = telemetry.peak_memory_bytes / predict_memory(telemetry)
+    runtime_ratio = telemetry.runtime_seconds / predict_runtime(telemetry)
+    return float(memory_ratio.quantile(0.95)), float(runtime_ratio.quantile(0.95))
+
+
+def matching_telemetry(
+    telemetry: pd.DataFrame, configuration: dict[str, str | bool]
+) -> pd.DataFrame:
+    """Select the telemetry of tasks run with the same configuration.
+
+    Falls back to all telemetry if no task has run with the configuration yet
+    (including telemetry recorded before configurations were).
+    """
+    if telemetry.empty or not set(configuration).issubset(telemetry.columns):
+        return telemetry
+    matches = np.logical_and.reduce(
+        [telemetry[column] == value for column, value in configuration.items()]
+    )
+    matching = telemetry[matches]
+    return matching if not matching.empty else telemetry
+
+
+def plan_resources(
+    features: pd.DataFrame,
+    telemetry: pd.DataFrame,
+    configuration: dict[str, str | bool],
+) -> pd.DataFrame:
+    """Estimate the resources for jobs from their features and past telemetry.
+
+    Parameters
+    ----------
+    features
+        The cost model features of each job, as produced by `build_features`.
+    telemetry
+        Records of completed tasks, as saved by the aggregation tasks.
+    configuration
+        The configuration the jobs will run with, as produced by
+        `utils.telemetry_configuration`. Only telemetry of tasks run with the same
+        configuration is used to calibrate the cost model, if there is any.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per job with the cores, memory (in GB) and runtime (in minutes)
+        to request for it.
+    """
+    memory_factor, runtime_factor = calibration_factors(
+        matching_telemetry(telemetry, configuration)
+    )
+
+    memory = predict_memory(features) * memory_factor * SAFETY_MARGIN / 2**30
+    runtime = predict_runtime(features) * runtime_factor * SAFETY_MARGIN / 60
+
+    plan = features[JOB_COLUMNS].copy()
+    plan["cores"] = 1
+    plan["memory_gb"] = (np.ceil(memory / MEMORY_STEP_GB) * MEMORY_STEP_GB).astype(int)
+    plan["runtime_minutes"] = (
+        np.ceil(runtime / RUNTIME_STEP_MINUTES) * RUNTIME_STEP_MINUTES
+    ).astype(int)
+    return plan
+
+
+def build_plan(
+    jobs: Sequence[tuple[str, str, str, str]],
+    time_resolution: str,
+    configuration: dict[str, str | bool],
+    pm_data: PopulationModelData,
+    cd_data: ClimateData,
+    ca_data: ClimateAggregateData,
+) -> pd.DataFrame:
+    """Estimate the resources needed for each aggregation job.
+
+    Parameters
+    ----------
+    jobs
+        The (scenario, measure, draw, hierarchy) tuples to plan.
+    time_resolution
+        The time resolution of the climate data to aggregate.
+    configuration
+        The configuration the jobs will run with, as produced by
+        `utils.telemetry_configuration`.
+    pm_data
+        PopulationModelData object to read raster and shape metadata from.
+    cd_data
+        ClimateData object to locate the climate inputs.
+    ca_data
+        ClimateAggregateData object to read telemetry of completed tasks from.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per job with the cores, memory (in GB) and runtime (in minutes)
+        to request for it.
+    """
+    if not jobs:
+        return pd.DataFrame(
+            columns=[*JOB_COLUMNS, "cores", "memory_gb", "runtime_minutes"]
+        )
+
+    features = build_features(jobs, time_resolution, pm_data, cd_data)
+    telemetry = ca_data.load_telemetry(utils.telemetry_step(time_resolution))
+    return plan_resources(features, telemetry, configuration)
+
+
+def job_resources(
+    plan: pd.DataFrame,
+) -> dict[tuple[str, ...], dict[str, str | int]]:
+    """Map each planned job to the cores, memory and runtime to request for it."""
+    columns = [*JOB_COLUMNS, "cores", "memory_gb", "runtime_minutes"]
+    return {
+        (scenario, measure, draw, hierarchy): {
+            "cores": int(cores),
+            "memory": f"{memory}G",
+            "runtime": f"{runtime}m",
+        }
+        for scenario, measure, draw, hierarchy, cores, memory, runtime in plan[
+            columns
+        ].itertuples(index=False, name=None)
+    }
+
+
+def print_plan(plan: pd.DataFrame) -> None:
+    """Print a summary of a resource plan grouped by resource request."""
+    summary = (
+        plan.groupby(["cores", "memory_gb", "runtime_minutes"])
+        .size()
+        .rename("tasks")
+        .reset_index()
+    )
+    core_hours = (plan.cores * plan.runtime_minutes).sum() / 60
+    print("Resource plan:")
+    print(summary.to_string(index=False))
+    print(f"Total: {len(plan)} tasks, at most {math.ceil(core_hours)} core-hours")
@@ -0,0 +1,286 @@
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import rasterra as rt
+from rasterio.io import DatasetReader
+
+from rra_climate_aggregates import constants as cac
+
+# Mean radius of the earth in km, for pixel areas.
+EARTH_RADIUS = 6371.0088
+
+
+class Reducer(ABC):
+    """Base class for per-location statistics accumulated in the reduction pass.
+
+    Reducers are updated block by block inside `utils.blockwise_location_sums`, so
+    every statistic comes from the same pass over a year's population and climate
+    rasters. Accumulated columns are combined across locations with
+    `aggregations` when rolling up a hierarchy, and `finalize` derives any final
+    columns (e.g. means or quantiles) once the roll-up is done.
+    """
+
+    name: str
+    # How each accumulated column is combined when rolling up a hierarchy.
+    aggregations: dict[str, str]
+    # Whether the statistic only depends on populated pixels.
+    population_weighted = False
+
+    def __init__(self) -> None:
+        self._state: dict[str, npt.NDArray[np.float64]] = {}
+
+    @abstractmethod
+    def reset(self, num_slots: int) -> None:
+        """Clear the accumulators for a new pass over `num_slots` slots."""
+
+    @abstractmethod
+    def update(
+        self,
+        slots: npt.NDArray[np.int32],
+        clim: npt.NDArray[np.float32],
+        pop: npt.NDArray[np.float32],
+        rows: slice,
+    ) -> None:
+        """Accumulate a block of rows.
+
+        Parameters
+        ----------
+        slots
+            The (time, row, col) accumulator slot of each pixel in the block.
+        clim
+            The (time, row, col) climate values of the block, with NaNs for
+            missing data.
+        pop
+            The (row, col) population of the block with NaNs replaced by 0.
+        rows
+            The rows of the full raster the block covers.
+        """
+
+    def columns(self, time_steps: int) -> dict[str, npt.NDArray[np.float64]]:
+        """Get the accumulated columns as (time, location) arrays.
+
+        Slot 0 of every time step collects pixels outside any location and is
+        dropped.
+        """
+        return {
+            column: values.reshape(time_steps, -1)[:, 1:]
+            for column, values in self._state.items()
+        }
+
+    def finalize(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Derive any final columns after the accumulated columns are rolled up."""
+        return data
+
+
+class PopulationHistogram(Reducer):
+    """Population in each bin of climate values.
+
+    The histogram directly gives exposure counts (population at or above each
+    bin edge) and approximate population-weighted quantiles, interpolated
+    linearly within bins.
+    """
+
+    name = "population_histogram"
+    population_weighted = True
+    quantiles = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+    def __init__(self, bin_edges: Sequence[float]) -> None:
+        super().__init__()
+        self.bin_edges = np.asarray(bin_edges, dtype=np.float64)
+        lower = [-np.inf, *self.bin_edges]
+        upper = [*self.bin_edges, np.inf]
+        self.bin_columns = [
+            f"population_{lo:g}_{hi:g}" for lo, hi in zip(lower, upper, strict=True)
+        ]
+        self.aggregations = dict.fromkeys(self.bin_columns, "sum")
+
+    def reset(self, num_slots: int) -> None:
+        self._counts = np.zeros(num_slots * len(self.bin_columns), dtype=np.float64)
+
+    def update(
+        self,
+        slots: npt.NDArray[np.int32],
+        clim: npt.NDArray[np.float32],
+        pop: npt.NDArray[np.float32],
+        rows: slice,  # noqa: ARG002
+    ) -> None:
+        valid = ~np.isnan(clim)
+        bins = np.digitize(clim[valid], self.bin_edges)
+        weights = np.broadcast_to(pop, clim.shape)[valid]
+        index = slots[valid] * len(self.bin_columns) + bins
+        counts = np.bincount(index, weights=weights)
+        self._counts[: counts.size] += counts
+
+    def columns(self, time_steps: int) -> dict[str, npt.NDArray[np.float64]]:
+        counts = self._counts.reshape(time_steps, -1, len(self.bin_columns))[:, 1:]
+        return {column: counts[..., i] for i, column in enumerate(self.bin_columns)}
+
+    def finalize(self, data: pd.DataFrame) -> pd.DataFrame:
+        counts = data[self.bin_columns].to_numpy()
+        cumulative = np.cumsum(counts, axis=1)
+        total = cumulative[:, -1:]
+
+        data = data.copy()
+        # Exposure: population at or above each bin edge.
+        for i, edge in enumerate(self.bin_edges):
+            data[f"population_ge_{edge:g}"] = total[:, 0] - cumulative[:, i]
+
+        # Quantiles, interpolating within bins and clamping the open-ended
+        # bins at the outer edges.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction = cumulative / total
+            lower = np.concatenate([self.bin_edges[:1], self.bin_edges])
+            upper = np.concatenate([self.bin_edges, self.bin_edges[-1:]])
+            rows = np.arange(len(data))
+            for q in self.quantiles:
+                idx = np.minimum((fraction < q).sum(axis=1), counts.shape[1] - 1)
+                below = np.where(idx > 0, fraction[rows, np.maximum(idx - 1, 0)], 0.0)
+                within = (q - below) / (fraction[rows, idx] - below)
+                value = lower[idx] + np.clip(within, 0, 1) * (upper[idx] - lower[idx])
+                data[f"p{round(q * 100):02d}"] = np.where(
+                    total[:, 0] > 0, value, np.nan
+                )
+        return data
+
+
+class AreaWeightedMean(Reducer):
+    """Mean climate over a location weighted by pixel area."""
+
+    name = "area_weighted_mean"
+    aggregations = {"weighted_climate": "sum", "area": "sum"}  # noqa: RUF012
+
+    def __init__(self, row_area: npt.NDArray[np.float64]) -> None:
+        super().__init__()
+        self.row_area = row_area
+
+    def reset(self, num_slots: int) -> None:
+        self._state = {
+            "weighted_climate": np.zeros(num_slots, dtype=np.float64),
+            "area": np.zeros(num_slots, dtype=np.float64),
+        }
+
+    def update(
+        self,
+        slots: npt.NDArray[np.int32],
+        clim: npt.NDArray[np.float32],
+        pop: npt.NDArray[np.float32],  # noqa: ARG002
+        rows: slice,
+    ) -> None:
+        valid = ~np.isnan(clim)
+        area = np.broadcast_to(self.row_area[rows, None], clim.shape)[valid]
+        index = slots[valid]
+        for column, weights in [
+            ("weighted_climate", area * clim[valid]),
+            ("area", area),
+        ]:
+            sums = np.bincount(index, weights=weights)
+            self._state[column][: sums.size] += sums
+
+    def finalize(self, data: pd.DataFrame) -> pd.DataFrame:
+        data = data.copy()
+        data["value"] = data.weighted_climate / data.area
+        return data.drop(columns=["weighted_climate"])
+
+
+class ClimateRange(Reducer):
+    """Minimum and maximum climate value over the pixels of a location."""
+
+    name = "climate_range"
+    aggregations = {"min": "min", "max": "max"}  # noqa: RUF012
+
+    def reset(self, num_slots: int) -> None:
+        self._state = {
+            "min": np.full(num_slots, np.inf, dtype=np.float64),
+            "max": np.full(num_slots, -np.inf, dtype=np.float64),
+        }
+
+    def update(
+        self,
+        slots: npt.NDArray[np.int32],
+        clim: npt.NDArray[np.float32],
+        pop: npt.NDArray[np.float32],  # noqa: ARG002
+        rows: slice,  # noqa: ARG002
+    ) -> None:
+        valid = ~np.isnan(clim)
+        index = slots[valid]
+        values = clim[valid]
+        if not index.size:
+            return
+        # Climate is upsampled onto the population grid, so neighboring pixels
+        # mostly repeat the same slot and value. Drop the repeats, then sort the
+        # rest by slot and reduce each run of slots at once.
+        repeat = (index[1:] == index[:-1]) & (values[1:] == values[:-1])
+        keep = np.ones(index.size, dtype=np.bool_)
+        keep[1:] = ~repeat
+        order = np.argsort(index[keep], kind="stable")
+        index = index[keep][order]
+        values = values[keep][order]
+        starts = np.flatnonzero(np.diff(index, prepend=-1))
+        index = index[starts]
+        for column, ufunc in [("min", np.minimum), ("max", np.maximum)]:
+            state = self._state[column]
+            state[index] = ufunc(state[index], ufunc.reduceat(values, starts))
+
+    def columns(self, time_steps: int) -> dict[str, npt.NDArray[np.float64]]:
+        # Locations with no valid pixels are left at +/- inf; report them as NaN.
+        return {
+            column: np.where(np.isinf(values), np.nan, values)
+            for column, values in super().columns(time_steps).items()
+        }
+
+
+def pixel_row_areas(
+    raster: rt.RasterArray | DatasetReader,
+) -> npt.NDArray[np.float64]:
+    """Compute the area in km^2 of the pixels in each row of a lat/lon raster."""
+    transform = raster.transform
+    edges = np.radians(transform.f + np.arange(raster.height + 1) * transform.e)
+    width = np.radians(abs(transform.a))
+    areas: npt.NDArray[np.float64] = (
+        EARTH_RADIUS**2 * width * np.abs(np.diff(np.sin(edges)))
+    )
+    return areas
+
+
+def build_reducers(
+    statistics: Sequence[str],
+    measure: str,
+    template: rt.RasterArray | DatasetReader,
+    bin_edges: Sequence[float] | None = None,
+) -> list[Reducer]:
+    """Build the reducers for a set of statistics.
+
+    Parameters
+    ----------
+    statistics
+        The names of the statistics to compute. Must be keys of the STATISTICS
+        constant.
+    measure
+        The climate measure being aggregated, used to pick default histogram bins.
+    template
+        A raster (or open rasterio dataset) on the population grid, used for
+        pixel areas.
+    bin_edges
+        Histogram bin edges to use instead of the defaults for the measure.
+
+    Returns
+    -------
+    list[Reducer]
+        One reducer per statistic.
+    """
+    reducers: list[Reducer] = []
+    for statistic in statistics:
+        if statistic == "population_histogram":
+            edges = cac.HISTOGRAM_BINS[measure] if bin_edges is None else bin_edges
+            reducers.append(PopulationHistogram(edges))
+        elif statistic == "area_weighted_mean":
+            reducers.append(AreaWeightedMean(pixel_row_areas(template)))
+        elif statistic == "climate_range":
+            reducers.append(ClimateRange())
+        else:
+            msg = f"Unknown statistic: {statistic}"
+            raise ValueError(msg)
+    return reducers
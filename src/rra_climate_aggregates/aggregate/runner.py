@@ -1,14 +1,22 @@
 import itertools
+import resource
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
 
 import click
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
+import rasterio
+import rasterra as rt
 import tqdm
-from rra_tools import jobmon
+import xarray as xr
 
 from rra_climate_aggregates import cli_options as clio
 from rra_climate_aggregates import constants as cac
-from rra_climate_aggregates.aggregate import utils
+from rra_climate_aggregates.aggregate import reducers, utils
 from rra_climate_aggregates.data import (
     ClimateAggregateData,
     ClimateData,
@@ -26,68 +34,97 @@ def aggregate_main(
     population_model_root: str,
     climate_data_root: str,
     output_dir: str,
+    statistics: Sequence[str] = (),
+    histogram_bins: Sequence[float] | None = None,
+    population_cache_dir: str | None = None,
+    compression: str = cac.PARQUET_COMPRESSION,
+    compression_level: int | None = None,
     *,
+    climate_cache: bool = False,
     progress_bar: bool = False,
 ) -> None:
     print(f"Aggregating {scenario} {measure} {draw} for {hierarchy}")
+    start = time.perf_counter()
     pm_data = PopulationModelData(population_model_root)
     cd_data = ClimateData(climate_data_root)
-    ca_data = ClimateAggregateData(output_dir)
+    ca_data = ClimateAggregateData(output_dir, compression, compression_level)
 
     subset_hierarchies = cac.HIERARCHY_MAP[hierarchy]
 
-    print("Loading climate data")
-    ds = cd_data.load_annual_results(scenario, measure, draw)
+    # The memory-mapped climate cache is only used when requested and current.
+    ds = None
+    if not (
+        climate_cache
+        and _climate_cache_is_current(ca_data, cd_data, scenario, measure, draw)
+    ):
+        print("Loading climate data")
+        ds = cd_data.load_annual_results(scenario, measure, draw)
 
     print("Building location masks")
     bounds_map, mask = utils.build_location_masks(hierarchy, pm_data)
 
-    print(f"Aggregating data with {len(bounds_map)} locations")
-    result_records = []
-    for year in tqdm.tqdm(cac.YEARS, disable=not progress_bar):
-        # Load population data and grab the underlying ndarray (we don't want the metadata)
-        pop_raster = pm_data.load_results(f"{year}q1")
-        pop_arr = pop_raster._ndarray  # noqa: SLF001
-
-        # Pull out and rasterize the climate data for the current year
-        clim_arr = (
-            to_raster(ds.sel(year=year)["value"])  # noqa: SLF001
-            .resample_to(pop_raster, "nearest")
-            .astype(np.float32)
-            ._ndarray
+    with rasterio.open(pm_data.results_path("2020q1")) as template:
+        stat_reducers = reducers.build_reducers(
+            statistics, measure, template, histogram_bins
         )
+    population_cache_dir, mask = _align_to_population_cache(
+        pm_data, population_cache_dir, mask, stat_reducers
+    )
 
-        weighted_clim_arr = pop_arr * clim_arr  # type: ignore[operator]
-
-        for location_id, (rows, cols) in tqdm.tqdm(
-            list(bounds_map.items()), disable=not progress_bar
-        ):
-            # Subset the mask to the bbox of the location, then convert from
-            # a uint32 of all location IDs to a boolean mask of the current location
-            loc_mask = mask[rows, cols] == location_id
+    # Gathered up front, as the inputs can change while the task runs.
+    features = {
+        "pixels": int(mask.size),
+        "bbox_pixels": utils.bbox_pixels(bounds_map),
+        "netcdf_bytes": cd_data.annual_results_path(scenario, measure, draw)
+        .stat()
+        .st_size,
+        "netcdf_files": 1,
+        "time_steps": 1,
+    }
 
-            # Subset and mask the weighted climate and population, then sum
-            # all non-nan values
-            loc_weighted_clim = np.nansum(weighted_clim_arr[rows, cols][loc_mask])
-            loc_pop = np.nansum(pop_arr[rows, cols][loc_mask])
-            # Calculate the population-weighted climate value
-            loc_clim = loc_weighted_clim / loc_pop if loc_pop else np.nan
+    # Years aggregated by a previous attempt of this task are checkpointed, so a
+    # retry only aggregates the years that are left.
+    checkpoint_args = (version, hierarchy, scenario, measure, draw)
+    result_frames, stat_frames = _load_checkpoint(
+        ca_data, stat_reducers, checkpoint_args
+    )
+    done_years = {year for df in result_frames for year in df.year_id.unique()}
+    remaining_years = [year for year in cac.YEARS if year not in done_years]
+    if done_years:
+        print(f"Resuming with {len(remaining_years)} years left to aggregate")
+    features["years"] = len(remaining_years)
 
-            result_records.append(
-                (location_id, year, scenario, loc_weighted_clim, loc_pop, loc_clim)
+    print(f"Aggregating data with {len(bounds_map)} locations")
+    location_ids = list(bounds_map)
+    bandwidths = []
+    with tqdm.tqdm(total=len(remaining_years), disable=not progress_bar) as pbar:
+        for years in itertools.batched(remaining_years, cac.CHECKPOINT_YEARS):
+            outputs = []
+            for year in years:
+                year_results, year_stats, bandwidth = _aggregate_year(
+                    pm_data,
+                    ca_data,
+                    ds,
+                    population_cache_dir,
+                    mask,
+                    location_ids,
+                    stat_reducers,
+                    scenario,
+                    measure,
+                    draw,
+                    year,
+                )
+                outputs.append((year_results, year_stats))
+                bandwidths.append(bandwidth)
+                pbar.update()
+            _save_checkpoint(
+                ca_data, outputs, result_frames, stat_frames, checkpoint_args
             )
 
-    results = pd.DataFrame(
-        result_records,
-        columns=[
-            "location_id",
-            "year_id",
-            "scenario",
-            "weighted_climate",
-            "population",
-            "value",
-        ],
-    ).sort_values(by=["location_id", "year_id"])
+    if bandwidths:
+        print(f"Mean reduction bandwidth: {np.mean(bandwidths) / 1e9:.2f} GB/s")
+
+    results = pd.concat(result_frames).sort_values(by=["location_id", "year_id"])
 
     agg_h = pm_data.load_hierarchy(hierarchy)
 
@@ -97,13 +134,24 @@ def aggregate_main(
         scenario == "ssp245" and measure == "mean_temperature" and draw == "000"
     )
     if is_write_pop_job:
-        # Aggregate population to the main hierarchy, then subset to each
-        # output hierarchy and save the results.
-        pop = utils.aggregate_pop_to_hierarchy(results, agg_h)
-        for subset_hierarchy in subset_hierarchies:
-            subset_h = pm_data.load_hierarchy(subset_hierarchy)
-            subset_pop = pop[pop.location_id.isin(subset_h.location_id)]
-            ca_data.save_population(subset_pop, version, subset_hierarchy)
+        _save_population(results, agg_h, ca_data, pm_data, version, hierarchy)
+
+    # Additional statistics are rolled up the same way, then finalized.
+    for reducer in stat_reducers:
+        stats = utils.aggregate_statistics_to_hierarchy(
+            pd.concat(stat_frames[reducer.name]), agg_h, reducer.aggregations
+        )
+        _save_statistics(
+            reducer.finalize(stats),
+            ca_data,
+            pm_data,
+            version,
+            hierarchy,
+            scenario,
+            measure,
+            draw,
+            reducer.name,
+        )
 
     # Same operation, aggregate, subset, and save
     climate = utils.aggregate_climate_to_hierarchy(results, agg_h)
@@ -118,6 +166,523 @@ def aggregate_main(
             measure,
             draw,
         )
+    ca_data.clear_checkpoint(*checkpoint_args)
+
+    # Record what this task cost so future runs can size their resource requests.
+    _save_telemetry(
+        ca_data,
+        version,
+        scenario,
+        measure,
+        draw,
+        hierarchy,
+        "annual",
+        features=features,
+        # What the task actually used, after falling back from any caches.
+        configuration=utils.telemetry_configuration(
+            statistics,
+            population_cache=population_cache_dir is not None,
+            climate_cache=ds is None,
+        ),
+        runtime_seconds=time.perf_counter() - start,
+    )
+
+
+def aggregate_subannual_main(
+    version: str,
+    scenario: str,
+    measure: str,
+    draw: str,
+    hierarchy: str,
+    time_resolution: str,
+    population_model_root: str,
+    climate_data_root: str,
+    output_dir: str,
+    population_cache_dir: str | None = None,
+    compression: str = cac.PARQUET_COMPRESSION,
+    compression_level: int | None = None,
+    *,
+    progress_bar: bool = False,
+) -> None:
+    print(f"Aggregating {time_resolution} {scenario} {measure} {draw} for {hierarchy}")
+    start = time.perf_counter()
+    pm_data = PopulationModelData(population_model_root)
+    cd_data = ClimateData(climate_data_root)
+    ca_data = ClimateAggregateData(output_dir, compression, compression_level)
+
+    subset_hierarchies = cac.HIERARCHY_MAP[hierarchy]
+
+    print("Building location masks")
+    bounds_map, mask = utils.build_location_masks(hierarchy, pm_data)
+    population_cache_dir, mask = _align_to_population_cache(
+        pm_data, population_cache_dir, mask
+    )
+    location_ids = list(bounds_map)
+    agg_h = pm_data.load_hierarchy(hierarchy)
+    subset_hs = {
+        subset_hierarchy: pm_data.load_hierarchy(subset_hierarchy)
+        for subset_hierarchy in subset_hierarchies
+    }
+
+    print(f"Aggregating data with {len(bounds_map)} locations")
+    years_aggregated = 0
+    for year in tqdm.tqdm(cac.YEARS, disable=not progress_bar):
+        # Results are partitioned by year, so years we've already written
+        # (e.g. on a retry) can be skipped.
+        year_done = all(
+            ca_data.subannual_raw_results_path(
+                version, h, scenario, measure, draw, time_resolution, year
+            ).exists()
+            for h in subset_hierarchies
+        )
+        if year_done:
+            continue
+
+        pop_raster = _load_population(pm_data, population_cache_dir, year)
+        pop_arr = pop_raster._ndarray  # noqa: SLF001
+
+        ds = cd_data.load_subannual_results(
+            time_resolution, scenario, measure, draw, year
+        )
+        values = ds["value"]
+        time_dim = next(d for d in values.dims if d not in ("latitude", "longitude"))
+        values = values.transpose(time_dim, "latitude", "longitude")
+        clim_template = to_raster(values.isel({time_dim: 0}))
+        _, clim_rows, clim_cols = utils.build_nearest_index(clim_template, pop_raster)
+
+        # Collapse the year's population onto the climate pixels of each location
+        # once, then reduce every time step against those weights. The stack is
+        # read lazily, north-up, a chunk of time steps at a time.
+        loc_pops, loc_index, pixel_index, weights = utils.build_location_weights(
+            pop_arr,
+            clim_rows,
+            clim_cols,
+            (clim_template.height, clim_template.width),
+            mask,
+            location_ids,
+        )
+        loc_weighted_clims = utils.weighted_location_sums(
+            values.isel(latitude=slice(None, None, -1)),
+            loc_index,
+            pixel_index,
+            weights,
+            len(location_ids),
+        )
+
+        time_steps = loc_weighted_clims.shape[0]
+        results = pd.DataFrame(
+            {
+                "location_id": np.tile(location_ids, time_steps),
+                "year_id": year,
+                "time_step": np.repeat(np.arange(1, time_steps + 1), len(location_ids)),
+                "scenario": scenario,
+                "weighted_climate": loc_weighted_clims.ravel(),
+                "population": np.tile(loc_pops, time_steps),
+            }
+        )
+        results["value"] = results.weighted_climate / results.population
+
+        climate = utils.aggregate_climate_to_hierarchy(
+            results, agg_h, index_columns=("year_id", "time_step", "scenario")
+        )
+        for subset_hierarchy, subset_h in subset_hs.items():
+            subset_climate = climate[climate.location_id.isin(subset_h.location_id)]
+            ca_data.save_subannual_raw_results(
+                subset_climate,
+                version,
+                subset_hierarchy,
+                scenario,
+                measure,
+                draw,
+                time_resolution,
+                year,
+            )
+        years_aggregated += 1
+
+    first_year_path = cd_data.subannual_results_path(
+        time_resolution, scenario, measure, draw, cac.YEARS[0]
+    )
+    _save_telemetry(
+        ca_data,
+        version,
+        scenario,
+        measure,
+        draw,
+        hierarchy,
+        time_resolution,
+        features={
+            "pixels": int(mask.size),
+            "bbox_pixels": utils.bbox_pixels(bounds_map),
+            "netcdf_bytes": first_year_path.stat().st_size,
+            "netcdf_files": len(cac.YEARS),
+            "years": years_aggregated,
+            "time_steps": cac.TIME_RESOLUTIONS[time_resolution],
+        },
+        configuration=utils.telemetry_configuration(
+            (),
+            population_cache=population_cache_dir is not None,
+            climate_cache=False,
+        ),
+        runtime_seconds=time.perf_counter() - start,
+    )
+
+
+def _aggregate_year(
+    pm_data: PopulationModelData,
+    ca_data: ClimateAggregateData,
+    ds: xr.Dataset | None,
+    population_cache_dir: str | None,
+    mask: npt.NDArray[np.uint32],
+    location_ids: list[int],
+    stat_reducers: Sequence[reducers.Reducer],
+    scenario: str,
+    measure: str,
+    draw: str,
+    year: int,
+) -> tuple[pd.DataFrame, dict[str, pd.DataFrame], float]:
+    # Load population data and grab the underlying ndarray (we don't want the metadata)
+    pop_raster = _load_population(pm_data, population_cache_dir, year)
+    pop_arr = pop_raster._ndarray  # noqa: SLF001
+
+    # Pull out the climate data for the current year along with a lookup
+    # from the population grid into the climate grid. We never materialize
+    # the climate data at population resolution.
+    clim_raster = _load_annual_climate(ca_data, ds, scenario, measure, draw, year)
+    clim_arr, clim_rows, clim_cols = utils.build_nearest_index(clim_raster, pop_raster)
+
+    loc_weighted_clims, loc_pops, bandwidth = utils.blockwise_location_sums(
+        pop_arr,
+        clim_arr,
+        clim_rows,
+        clim_cols,
+        mask,
+        location_ids,
+        stat_reducers,
+    )
+
+    results = pd.DataFrame(
+        {
+            "location_id": location_ids,
+            "year_id": year,
+            "scenario": scenario,
+            "weighted_climate": loc_weighted_clims,
+            "population": loc_pops,
+        }
+    )
+    # Calculate the population-weighted climate value
+    results["value"] = (results.weighted_climate / results.population).where(
+        results.population != 0
+    )
+    stats = {
+        reducer.name: _statistics_frame(reducer, location_ids, year, scenario)
+        for reducer in stat_reducers
+    }
+    return results, stats, bandwidth
+
+
+def _load_checkpoint(
+    ca_data: ClimateAggregateData,
+    stat_reducers: Sequence[reducers.Reducer],
+    checkpoint_args: tuple[str, str, str, str, str],
+) -> tuple[list[pd.DataFrame], dict[str, list[pd.DataFrame]]]:
+    # Parts computed with other statistics or histogram bins can't be combined
+    # with the ones we're about to compute, so start over if the config changed.
+    config = _checkpoint_config(stat_reducers)
+    if ca_data.load_checkpoint_config(*checkpoint_args) != config:
+        ca_data.clear_checkpoint(*checkpoint_args)
+        ca_data.save_checkpoint_config(config, *checkpoint_args)
+
+    result_frames = ca_data.load_checkpoint("results", *checkpoint_args)
+    done_years = [year for df in result_frames for year in df.year_id.unique()]
+    # Statistics are checkpointed before results, so drop any left over from
+    # years that didn't finish.
+    stat_frames = {
+        reducer.name: [
+            df[df.year_id.isin(done_years)]
+            for df in ca_data.load_checkpoint(reducer.name, *checkpoint_args)
+        ]
+        for reducer in stat_reducers
+    }
+    return result_frames, stat_frames
+
+
+def _checkpoint_config(stat_reducers: Sequence[reducers.Reducer]) -> dict[str, Any]:
+    histogram_bins = [
+        reducer.bin_edges.tolist()
+        for reducer in stat_reducers
+        if isinstance(reducer, reducers.PopulationHistogram)
+    ]
+    return {
+        "statistics": [reducer.name for reducer in stat_reducers],
+        "histogram_bins": histogram_bins[0] if histogram_bins else None,
+    }
+
+
+def _climate_cache_is_current(
+    ca_data: ClimateAggregateData,
+    cd_data: ClimateData,
+    scenario: str,
+    measure: str,
+    draw: str,
+) -> bool:
+    """Check the climate cache exists and was built from the current NetCDF."""
+    if not ca_data.climate_cache_path(scenario, measure, draw).exists():
+        print("Climate cache not found, reading climate data instead")
+        return False
+    source = cd_data.annual_results_path(scenario, measure, draw)
+    if not ca_data.climate_cache_is_current(scenario, measure, draw, source):
+        print("Climate cache is out of date, reading climate data instead")
+        return False
+    metadata = ca_data.load_climate_cache_metadata(scenario, measure, draw)
+    print(f"Using cached climate data ({metadata['dtype']})")
+    return True
+
+
+def _load_annual_climate(
+    ca_data: ClimateAggregateData,
+    ds: xr.Dataset | None,
+    scenario: str,
+    measure: str,
+    draw: str,
+    year: int,
+) -> rt.RasterArray:
+    # No dataset means we're reading from the climate cache.
+    if ds is None:
+        return ca_data.load_climate_cache(scenario, measure, draw, year)
+    return to_raster(ds.sel(year=year)["value"])
+
+
+def _statistics_frame(
+    reducer: reducers.Reducer,
+    location_ids: list[int],
+    year: int,
+    scenario: str,
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "location_id": location_ids,
+            "year_id": year,
+            "scenario": scenario,
+            **{column: values[0] for column, values in reducer.columns(1).items()},
+        }
+    )
+
+
+def _align_to_population_cache(
+    pm_data: PopulationModelData,
+    population_cache_dir: str | None,
+    mask: npt.NDArray[np.uint32],
+    stat_reducers: Sequence[reducers.Reducer] = (),
+) -> tuple[str | None, npt.NDArray[np.uint32]]:
+    """Decide whether to read population from the cache and align the mask with it.
+
+    A cache cropped to the populated extent gives the same results for anything
+    weighted by population, since every pixel outside it is unpopulated. Any
+    other statistic needs the full grid, so we fall back to the GeoTIFFs. The
+    launcher checks the cache is usable before submitting tasks, but we also fall
+    back if it has since gone missing or been rebuilt from another population
+    model.
+    """
+    if population_cache_dir is None:
+        return None, mask
+    if not pm_data.population_cache_path(population_cache_dir).exists():
+        print("Population cache not found, reading population rasters instead")
+        return None, mask
+    if not pm_data.population_cache_is_current(population_cache_dir):
+        print(
+            "Population cache was built from a different population model, "
+            "reading population rasters instead"
+        )
+        return None, mask
+    rows, cols = pm_data.population_cache_window(population_cache_dir)
+    cropped = (rows.stop - rows.start, cols.stop - cols.start) != mask.shape
+    if cropped and not all(r.population_weighted for r in stat_reducers):
+        print("Population cache is cropped, reading population rasters instead")
+        return None, mask
+    print("Using cached population data")
+    return population_cache_dir, mask[rows, cols]
+
+
+def _load_population(
+    pm_data: PopulationModelData,
+    population_cache_dir: str | None,
+    year: int,
+) -> rt.RasterArray:
+    if population_cache_dir is None:
+        return pm_data.load_results(f"{year}q1")
+    return pm_data.load_population_cache(population_cache_dir, year)
+
+
+def _save_checkpoint(
+    ca_data: ClimateAggregateData,
+    outputs: list[tuple[pd.DataFrame, dict[str, pd.DataFrame]]],
+    result_frames: list[pd.DataFrame],
+    stat_frames: dict[str, list[pd.DataFrame]],
+    checkpoint_args: tuple[str, str, str, str, str],
+) -> None:
+    # Statistics go first, so a results part marks its years as done.
+    for name, frames in stat_frames.items():
+        frames.append(pd.concat([year_stats[name] for _, year_stats in outputs]))
+        ca_data.save_checkpoint(frames[-1], name, *checkpoint_args)
+    result_frames.append(pd.concat([year_results for year_results, _ in outputs]))
+    ca_data.save_checkpoint(result_frames[-1], "results", *checkpoint_args)
+
+
+def _save_population(
+    results: pd.DataFrame,
+    agg_h: pd.DataFrame,
+    ca_data: ClimateAggregateData,
+    pm_data: PopulationModelData,
+    version: str,
+    hierarchy: str,
+) -> None:
+    # Aggregate population to the main hierarchy, then subset to each
+    # output hierarchy and save the results.
+    pop = utils.aggregate_pop_to_hierarchy(results, agg_h)
+    for subset_hierarchy in cac.HIERARCHY_MAP[hierarchy]:
+        subset_h = pm_data.load_hierarchy(subset_hierarchy)
+        subset_pop = pop[pop.location_id.isin(subset_h.location_id)]
+        ca_data.save_population(subset_pop, version, subset_hierarchy)
+
+
+def _save_statistics(
+    stats: pd.DataFrame,
+    ca_data: ClimateAggregateData,
+    pm_data: PopulationModelData,
+    version: str,
+    hierarchy: str,
+    scenario: str,
+    measure: str,
+    draw: str,
+    statistic: str,
+) -> None:
+    for subset_hierarchy in cac.HIERARCHY_MAP[hierarchy]:
+        subset_h = pm_data.load_hierarchy(subset_hierarchy)
+        subset_stats = stats[stats.location_id.isin(subset_h.location_id)]
+        ca_data.save_raw_statistics(
+            subset_stats,
+            version,
+            subset_hierarchy,
+            scenario,
+            measure,
+            draw,
+            statistic,
+        )
+
+
+def _job_outputs(
+    ca_data: ClimateAggregateData,
+    version: str,
+    time_resolution: str,
+    statistics: Sequence[str],
+    scenario: str,
+    measure: str,
+    draw: str,
+    hierarchy: str,
+) -> list[Path]:
+    """List the outputs that mark an aggregation job as done."""
+    paths = []
+    # Outputs are written for every hierarchy the pixel hierarchy maps to.
+    for subset_h in cac.HIERARCHY_MAP[hierarchy]:
+        if time_resolution == "annual":
+            # A job is done once its results and every requested statistic
+            # are written.
+            paths.append(
+                ca_data.raw_results_path(version, subset_h, scenario, measure, draw)
+            )
+            paths.extend(
+                ca_data.raw_statistics_path(
+                    version, subset_h, scenario, measure, draw, statistic
+                )
+                for statistic in statistics
+            )
+        else:
+            # Sub-annual results are written year by year, so the last year
+            # marks a complete job.
+            paths.append(
+                ca_data.subannual_raw_results_path(
+                    version,
+                    subset_h,
+                    scenario,
+                    measure,
+                    draw,
+                    time_resolution,
+                    cac.YEARS[-1],
+                )
+            )
+    return paths
+
+
+def _task_args(
+    version: str,
+    population_model_dir: str,
+    climate_data_dir: str,
+    output_dir: str,
+    time_resolution: str,
+    statistics: list[str],
+    histogram_bins: list[float] | None,
+    population_cache_dir: str | None,
+    compression: str,
+    compression_level: int | None,
+    *,
+    climate_cache: bool,
+) -> dict[str, str | None]:
+    task_args: dict[str, str | None] = {
+        "version": version,
+        "population-model-dir": population_model_dir,
+        "climate-data-dir": climate_data_dir,
+        "output-dir": output_dir,
+        "time-resolution": time_resolution,
+        "compression": compression,
+    }
+    if statistics:
+        task_args["statistics"] = ",".join(statistics)
+    if histogram_bins is not None:
+        # repr round-trips exactly, so tasks bin with the edges we were given.
+        task_args["histogram-bins"] = ",".join(repr(edge) for edge in histogram_bins)
+    if population_cache_dir is not None:
+        task_args["population-cache-dir"] = population_cache_dir
+    if compression_level is not None:
+        task_args["compression-level"] = str(compression_level)
+    if climate_cache:
+        # Flags are passed with no value.
+        task_args["climate-cache"] = None
+    return task_args
+
+
+def _save_telemetry(
+    ca_data: ClimateAggregateData,
+    version: str,
+    scenario: str,
+    measure: str,
+    draw: str,
+    hierarchy: str,
+    time_resolution: str,
+    features: dict[str, int],
+    configuration: dict[str, str | bool],
+    runtime_seconds: float,
+) -> None:
+    record = {
+        "scenario": scenario,
+        "measure": measure,
+        "draw": draw,
+        "hierarchy": hierarchy,
+        "time_resolution": time_resolution,
+        **configuration,
+        **features,
+        "runtime_seconds": runtime_seconds,
+        # ru_maxrss is reported in KiB on Linux
+        "peak_memory_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+    ca_data.save_telemetry(
+        record,
+        utils.telemetry_step(time_resolution),
+        version,
+        hierarchy,
+        scenario,
+        measure,
+        draw,
+    )
 
 
 @click.command()
@@ -129,6 +694,13 @@ def aggregate_main(
 @clio.with_input_directory("population-model", cac.POPULATION_MODEL_ROOT)
 @clio.with_input_directory("climate-data", cac.CLIMATE_DATA_ROOT)
 @clio.with_output_directory(cac.MODEL_ROOT)
+@clio.with_time_resolution()
+@clio.with_statistics()
+@clio.with_histogram_bins()
+@clio.with_population_cache_dir()
+@clio.with_compression()
+@clio.with_compression_level()
+@clio.with_climate_cache()
 @clio.with_progress_bar()
 def aggregate_task(
     version: str,
@@ -139,20 +711,56 @@ def aggregate_task(
     population_model_dir: str,
     climate_data_dir: str,
     output_dir: str,
+    time_resolution: str,
+    statistics: list[str],
+    histogram_bins: list[float] | None,
+    population_cache_dir: str | None,
+    compression: str,
+    compression_level: int | None,
     *,
+    climate_cache: bool,
     progress_bar: bool,
 ) -> None:
-    aggregate_main(
-        version,
-        scenario,
-        measure,
-        draw,
-        hierarchy,
-        population_model_dir,
-        climate_data_dir,
-        output_dir,
-        progress_bar=progress_bar,
-    )
+    if time_resolution != "annual" and (statistics or climate_cache):
+        msg = (
+            "Additional statistics and the climate cache are only supported "
+            "for annual aggregation."
+        )
+        raise click.UsageError(msg)
+    if time_resolution == "annual":
+        aggregate_main(
+            version,
+            scenario,
+            measure,
+            draw,
+            hierarchy,
+            population_model_dir,
+            climate_data_dir,
+            output_dir,
+            statistics,
+            histogram_bins,
+            population_cache_dir,
+            compression,
+            compression_level,
+            climate_cache=climate_cache,
+            progress_bar=progress_bar,
+        )
+    else:
+        aggregate_subannual_main(
+            version,
+            scenario,
+            measure,
+            draw,
+            hierarchy,
+            time_resolution,
+            population_model_dir,
+            climate_data_dir,
+            output_dir,
+            population_cache_dir,
+            compression,
+            compression_level,
+            progress_bar=progress_bar,
+        )
 
 
 @click.command()
@@ -164,7 +772,16 @@ def aggregate_task(
 @clio.with_input_directory("population-model", cac.POPULATION_MODEL_ROOT)
 @clio.with_input_directory("climate-data", cac.CLIMATE_DATA_ROOT)
 @clio.with_output_directory(cac.MODEL_ROOT)
+@clio.with_time_resolution()
+@clio.with_statistics()
+@clio.with_histogram_bins()
+@clio.with_population_cache_dir()
+@clio.with_compression()
+@clio.with_compression_level()
+@clio.with_climate_cache()
 @clio.with_queue()
+@clio.with_executor()
+@clio.with_dry_run()
 def aggregate(
     version: str,
     scenario: list[str],
@@ -174,38 +791,94 @@ def aggregate(
     population_model_dir: str,
     climate_data_dir: str,
     output_dir: str,
+    time_resolution: str,
+    statistics: list[str],
+    histogram_bins: list[float] | None,
+    population_cache_dir: str | None,
+    compression: str,
+    compression_level: int | None,
     queue: str,
+    executor: str,
+    *,
+    climate_cache: bool,
+    dry_run: bool,
 ) -> None:
-    ca_data = ClimateAggregateData(output_dir)
+    pm_data = PopulationModelData(population_model_dir)
+    cd_data = ClimateData(climate_data_dir)
+    try:
+        ca_data = ClimateAggregateData(output_dir, compression, compression_level)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+    if time_resolution != "annual" and (statistics or climate_cache):
+        msg = (
+            "Additional statistics and the climate cache are only supported "
+            "for annual aggregation."
+        )
+        raise click.UsageError(msg)
+
+    if population_cache_dir is not None and not pm_data.population_cache_is_current(
+        population_cache_dir
+    ):
+        msg = (
+            f"No population cache built from {population_model_dir} found in "
+            f"{population_cache_dir}. Build it with `carun population_cache` on a "
+            "path shared by all nodes."
+        )
+        raise click.UsageError(msg)
+
+    # Only the launcher plans and submits jobs, so tasks don't import these.
+    from rra_climate_aggregates import executor as cae
+    from rra_climate_aggregates.aggregate import planner
+
+    task_args = _task_args(
+        version,
+        population_model_dir,
+        climate_data_dir,
+        output_dir,
+        time_resolution,
+        statistics,
+        histogram_bins,
+        population_cache_dir,
+        compression,
+        compression_level,
+        climate_cache=climate_cache,
+    )
 
     jobs = []
     for s, m, j, h in itertools.product(scenario, measure, draw, hierarchy):
-        if not ca_data.raw_results_path(version, h, s, m, j).exists():
+        paths = _job_outputs(ca_data, version, time_resolution, statistics, s, m, j, h)
+        if not all(path.exists() for path in paths):
             jobs.append((s, m, j, h))
     jobs = list(set(jobs))
 
     print(f"Running {len(jobs)} jobs")
 
-    jobmon.run_parallel(
+    configuration = utils.telemetry_configuration(
+        statistics,
+        population_cache=population_cache_dir is not None,
+        climate_cache=climate_cache,
+    )
+    plan = planner.build_plan(
+        jobs, time_resolution, configuration, pm_data, cd_data, ca_data
+    )
+    planner.print_plan(plan)
+    if dry_run or plan.empty:
+        return
+
+    # All jobs are submitted together, each with the resources planned for it.
+    resources = planner.job_resources(plan)
+    cae.run_parallel(
+        executor,
         runner="catask",
         task_name="aggregate",
-        flat_node_args=(
-            ("scenario", "measure", "draw", "hierarchy"),
-            jobs,
-        ),
-        task_args={
-            "version": version,
-            "population-model-dir": population_model_dir,
-            "climate-data-dir": climate_data_dir,
-            "output-dir": output_dir,
-        },
+        flat_node_args=(tuple(planner.JOB_COLUMNS), list(resources)),
+        task_args=task_args,
         task_resources={
             "queue": queue,
-            "cores": 1,
-            "memory": "30G",
-            "runtime": "400m",
             "project": "proj_rapidresponse",
         },
         log_root=ca_data.log_dir("aggregate"),
         max_attempts=3,
+        per_task_resources=resources.__getitem__,
     )
@@ -1,10 +1,18 @@
+import itertools
+import time
+from collections.abc import Sequence
+from typing import Any
+
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
 import rasterra as rt
+import xarray as xr
 from rasterio.features import MergeAlg, rasterize
+from rasterio.io import DatasetReader
 from shapely import MultiPolygon, Polygon
 
+from rra_climate_aggregates.aggregate.reducers import Reducer
 from rra_climate_aggregates.data import (
     PopulationModelData,
 )
@@ -56,7 +64,7 @@ def build_location_masks(
 
 
 def build_bounds_map(
-    raster_template: rt.RasterArray,
+    raster_template: rt.RasterArray | DatasetReader,
     shape_values: list[tuple[Polygon | MultiPolygon, int]],
 ) -> dict[int, tuple[slice, slice]]:
     """Build a map of location IDs to buffered slices of the raster template.
@@ -64,7 +72,8 @@ def build_bounds_map(
     Parameters
     ----------
     raster_template
-        The raster template to build the bounds map for.
+        The raster template to build the bounds map for. Only the transform and
+        shape are used, so an open rasterio dataset works as well.
     shape_values
         A list of tuples where the first element is a shapely Polygon or MultiPolygon
         in the CRS of the raster template and the second element is the location ID
@@ -96,6 +105,406 @@ def build_bounds_map(
     return bounds_map
 
 
+def bbox_pixels(bounds_map: dict[int, tuple[slice, slice]]) -> int:
+    """Count the pixels covered by all location bounding boxes in a bounds map."""
+    return sum(
+        (rows.stop - rows.start) * (cols.stop - cols.start)
+        for rows, cols in bounds_map.values()
+    )
+
+
+def telemetry_step(time_resolution: str) -> str:
+    """Get the name telemetry for aggregation at a time resolution is stored under."""
+    if time_resolution == "annual":
+        return "aggregate"
+    return f"aggregate_{time_resolution}"
+
+
+def telemetry_configuration(
+    statistics: Sequence[str],
+    *,
+    population_cache: bool,
+    climate_cache: bool,
+) -> dict[str, str | bool]:
+    """Describe the options that change the cost of an aggregation task.
+
+    Telemetry is recorded with, and calibrated against, this configuration, as
+    additional statistics and the caches change what a task spends its time and
+    memory on.
+    """
+    return {
+        "statistics": ",".join(sorted(statistics)),
+        "population_cache": population_cache,
+        "climate_cache": climate_cache,
+    }
+
+
+def build_nearest_index(
+    source: rt.RasterArray,
+    target: rt.RasterArray,
+) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """Build a nearest-neighbor lookup from a target grid into a source grid.
+
+    This is the separable equivalent of ``source.resample_to(target, "nearest")``
+    for north-up grids in the same CRS. Rather than materializing the resampled
+    source on the (much larger) target grid, we return the row and column of the
+    source pixel that each target row and column falls in, so callers can gather
+    source values one block of target rows at a time.
+
+    Parameters
+    ----------
+    source
+        The raster to sample values from.
+    target
+        The raster whose grid we want source values on.
+
+    Returns
+    -------
+    tuple[npt.NDArray[np.float32], npt.NDArray[np.intp], npt.NDArray[np.intp]]
+        The first element is the source data cast to float32 and padded
+        with a trailing row and column of NaNs. The second and third elements are
+        the source row index for each target row and the source column index for
+        each target column. Target pixels that fall outside the source grid index
+        into the NaN padding.
+    """
+    padded = np.full((source.height + 1, source.width + 1), np.nan, dtype=np.float32)
+    padded[:-1, :-1] = source._ndarray  # noqa: SLF001
+    if not np.isnan(source.no_data_value):
+        padded[padded == source.no_data_value] = np.nan
+
+    rows = _nearest_index(
+        source.transform.f,
+        source.transform.e,
+        source.height,
+        target.transform.f,
+        target.transform.e,
+        target.height,
+    )
+    cols = _nearest_index(
+        source.transform.c,
+        source.transform.a,
+        source.width,
+        target.transform.c,
+        target.transform.a,
+        target.width,
+    )
+    return padded, rows, cols
+
+
+def _nearest_index(
+    source_origin: float,
+    source_step: float,
+    source_size: int,
+    target_origin: float,
+    target_step: float,
+    target_size: int,
+) -> npt.NDArray[np.intp]:
+    # Map target pixel centers into fractional source pixel coordinates.
+    centers = target_origin + (np.arange(target_size) + 0.5) * target_step
+    index: npt.NDArray[np.intp] = np.floor(
+        (centers - source_origin) / source_step
+    ).astype(np.intp)
+    # Anything out of bounds points at the NaN padding at the end of the source.
+    index[(index < 0) | (index >= source_size)] = source_size
+    return index
+
+
+def blockwise_location_sums(
+    pop_arr: npt.NDArray[Any],
+    clim_arr: npt.NDArray[np.float32],
+    clim_rows: npt.NDArray[np.intp],
+    clim_cols: npt.NDArray[np.intp],
+    location_mask: npt.NDArray[np.uint32],
+    location_ids: list[int],
+    reducers: Sequence[Reducer] = (),
+    block_bytes: int = 2**18,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float]:
+    """Sum population-weighted climate and population by location in one pass.
+
+    The rasters are walked in blocks of rows sized to fit in cache. For each
+    block, the climate data is gathered onto the population grid, multiplied by
+    population, NaNs are dropped, and the results are accumulated into per-location
+    float64 totals. All temporaries are sized to a single block and reused, so
+    nothing proportional to the full raster is allocated.
+
+    The climate data may be a (time, y, x) stack, in which case every time step is
+    reduced against the same population and location mask in the same pass. Any
+    additional reducers are reset and updated with each block in the same pass.
+
+    Parameters
+    ----------
+    pop_arr
+        The population raster data.
+    clim_arr
+        The padded climate source data, as produced by `build_nearest_index`.
+        Either a single (y, x) array or a (time, y, x) stack.
+    clim_rows
+        The climate row index for each row of the population raster.
+    clim_cols
+        The climate column index for each column of the population raster.
+    location_mask
+        A raster of location IDs aligned with the population raster, as produced
+        by `build_location_masks`. Pixels with a value of 0 belong to no location.
+    location_ids
+        The location IDs to produce totals for.
+    reducers
+        Additional statistics to accumulate in the same pass.
+    block_bytes
+        The target size in bytes of a single float32 block of rows.
+
+    Returns
+    -------
+    tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float]
+        The population-weighted climate sum and the population sum for each
+        location in `location_ids`, and the effective memory bandwidth of the
+        reduction in bytes per second. For a climate stack, the weighted climate
+        sum has shape (time, location).
+    """
+    height, width = pop_arr.shape
+    clim_stack = clim_arr.reshape(-1, *clim_arr.shape[-2:])
+    time_steps = clim_stack.shape[0]
+    block_rows = max(
+        1, block_bytes // (time_steps * width * np.dtype(np.float32).itemsize)
+    )
+
+    # Map location IDs onto dense accumulator slots. Slot 0 collects pixels that
+    # belong to no location (or to locations we weren't asked about).
+    # int32 halves the memory traffic of the slot arrays over intp.
+    lookup = np.zeros(max(location_ids, default=0) + 1, dtype=np.int32)
+    lookup[location_ids] = np.arange(1, len(location_ids) + 1)
+    num_slots = len(location_ids) + 1
+    weighted_sum = np.zeros(time_steps * num_slots, dtype=np.float64)
+    pop_sum = np.zeros(num_slots, dtype=np.float64)
+    # Offsets that give each time step its own run of accumulator slots, so all
+    # time steps can be accumulated with a single bincount.
+    time_offsets = (np.arange(time_steps, dtype=np.int32) * num_slots)[:, None, None]
+
+    clim_block = np.empty((time_steps, block_rows, width), dtype=np.float32)
+    weighted_block = np.empty((time_steps, block_rows, width), dtype=np.float32)
+    nan_block = np.empty((time_steps, block_rows, width), dtype=np.bool_)
+    pop_block = np.empty((block_rows, width), dtype=np.float32)
+    for reducer in reducers:
+        reducer.reset(time_steps * num_slots)
+
+    bytes_moved = 0
+    start = time.perf_counter()
+    for r0 in range(0, height, block_rows):
+        r1 = min(r0 + block_rows, height)
+        n = r1 - r0
+        pop = pop_arr[r0:r1]
+        clim = clim_block[:, :n]
+        weighted = weighted_block[:, :n]
+        is_nan = nan_block[:, :n]
+
+        # Gather climate onto the population grid for just this block.
+        np.take(clim_stack[:, clim_rows[r0:r1]], clim_cols, axis=2, out=clim)
+        np.multiply(pop, clim, out=weighted)
+        np.isnan(weighted, out=is_nan)
+        weighted[is_nan] = 0.0
+        # Population is summed independently of climate coverage.
+        nan_free_pop = pop_block[:n]
+        np.copyto(nan_free_pop, pop)
+        np.isnan(nan_free_pop, out=is_nan[0])
+        nan_free_pop[is_nan[0]] = 0.0
+
+        slots = lookup[location_mask[r0:r1]]
+        time_slots = slots + time_offsets
+        block_weighted = np.bincount(time_slots.ravel(), weights=weighted.ravel())
+        block_pop = np.bincount(slots.ravel(), weights=nan_free_pop.ravel())
+        weighted_sum[: block_weighted.size] += block_weighted
+        pop_sum[: block_pop.size] += block_pop
+
+        for reducer in reducers:
+            reducer.update(time_slots, clim, nan_free_pop, slice(r0, r1))
+
+        bytes_moved += pop.nbytes + location_mask[r0:r1].nbytes + clim.nbytes
+    elapsed = time.perf_counter() - start
+    bandwidth = bytes_moved / elapsed if elapsed else float("inf")
+
+    location_sums = weighted_sum.reshape(time_steps, num_slots)[:, 1:]
+    if clim_arr.ndim == 2:  # noqa: PLR2004
+        location_sums = location_sums[0]
+    return location_sums, pop_sum[1:], bandwidth
+
+
+def build_location_weights(
+    pop_arr: npt.NDArray[Any],
+    clim_rows: npt.NDArray[np.intp],
+    clim_cols: npt.NDArray[np.intp],
+    clim_shape: tuple[int, int],
+    location_mask: npt.NDArray[np.uint32],
+    location_ids: list[int],
+) -> tuple[
+    npt.NDArray[np.float64],
+    npt.NDArray[np.intp],
+    npt.NDArray[np.intp],
+    npt.NDArray[np.float64],
+]:
+    """Collapse population onto the climate pixels of each location.
+
+    Within a year, the population, the location of each population pixel and the
+    climate pixel it falls in don't change. Summing population by (location,
+    climate pixel) once gives sparse weights that every time step of the year can
+    be reduced against with `weighted_location_sums`, doing work proportional to
+    the number of weights rather than to the population grid.
+
+    Population rows are processed in runs that fall in the same climate row, so
+    the (location, climate column) pairs of a run can be summed with a dense
+    bincount over the locations present in it.
+
+    Parameters
+    ----------
+    pop_arr
+        The population raster data.
+    clim_rows
+        The climate row index for each row of the population raster, as produced
+        by `build_nearest_index`. Rows outside the climate grid have an index of
+        at least the climate grid height.
+    clim_cols
+        The climate column index for each column of the population raster.
+    clim_shape
+        The (unpadded) shape of the climate grid.
+    location_mask
+        A raster of location IDs aligned with the population raster, as produced
+        by `build_location_masks`. Pixels with a value of 0 belong to no location.
+    location_ids
+        The location IDs to produce weights for.
+
+    Returns
+    -------
+    pop_sum
+        The population sum for each location in `location_ids`, including
+        population outside the climate grid.
+    location_index
+        The position in `location_ids` of the location of each weight. Weights
+        are sorted by location.
+    pixel_index
+        The flat index in the climate grid of the climate pixel of each weight.
+    weights
+        The population of each (location, climate pixel) pair.
+    """
+    clim_height, clim_width = clim_shape
+    num_slots = len(location_ids) + 1
+    lookup = np.zeros(max(location_ids, default=0) + 1, dtype=np.int32)
+    lookup[location_ids] = np.arange(1, num_slots)
+
+    pop_sum = np.zeros(num_slots, dtype=np.float64)
+    in_grid = clim_cols < clim_width
+    cols = clim_cols[in_grid]
+    present = np.zeros(num_slots, dtype=np.bool_)
+    slot_parts, pixel_parts, weight_parts = [], [], []
+    run_starts = np.flatnonzero(np.diff(clim_rows)) + 1
+    for r0, r1 in itertools.pairwise([0, *run_starts, len(clim_rows)]):
+        pop = np.nan_to_num(pop_arr[r0:r1], nan=0.0)
+        slots = lookup[location_mask[r0:r1]]
+        pop_sum += np.bincount(slots.ravel(), weights=pop.ravel(), minlength=num_slots)
+        clim_row = clim_rows[r0]
+        if clim_row >= clim_height:
+            continue
+
+        # Number the locations present in the run so the keys stay dense.
+        pop = pop[:, in_grid]
+        slots = slots[:, in_grid]
+        present[:] = False
+        present[slots] = True
+        present_slots = np.flatnonzero(present)
+        dense = np.cumsum(present) - 1
+        keys = dense[slots] * clim_width + cols
+        run_keys, run_weights = _sparse_bincount(
+            keys.ravel(), pop.ravel(), len(present_slots) * clim_width
+        )
+
+        run_slots = present_slots[run_keys // clim_width]
+        # Slot 0 holds pixels outside any location.
+        keep = run_slots > 0
+        slot_parts.append(run_slots[keep] - 1)
+        pixel_parts.append(clim_row * clim_width + run_keys[keep] % clim_width)
+        weight_parts.append(run_weights[keep])
+
+    location_index = np.concatenate([np.empty(0, dtype=np.intp), *slot_parts])
+    order = np.argsort(location_index, kind="stable")
+    pixel_index = np.concatenate([np.empty(0, dtype=np.intp), *pixel_parts])
+    weights = np.concatenate([np.empty(0, dtype=np.float64), *weight_parts])
+    return pop_sum[1:], location_index[order], pixel_index[order], weights[order]
+
+
+# A dense bincount is used while it has at most this many bins per key.
+DENSE_BINCOUNT_FACTOR = 4
+
+
+def _sparse_bincount(
+    keys: npt.NDArray[np.intp],
+    weights: npt.NDArray[Any],
+    num_keys: int,
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64]]:
+    # Sum weights by key, returning only keys with a nonzero sum.
+    if num_keys <= DENSE_BINCOUNT_FACTOR * keys.size:
+        sums = np.bincount(keys, weights=weights, minlength=num_keys).astype(
+            np.float64, copy=False
+        )
+        nonzero = np.flatnonzero(sums)
+        return nonzero, sums[nonzero]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=weights).astype(np.float64, copy=False)
+    nonzero = sums != 0
+    return unique[nonzero], sums[nonzero]
+
+
+def weighted_location_sums(
+    stack: npt.NDArray[np.floating[Any]] | xr.DataArray,
+    location_index: npt.NDArray[np.intp],
+    pixel_index: npt.NDArray[np.intp],
+    weights: npt.NDArray[np.float64],
+    num_locations: int,
+    chunk_bytes: int = 2**28,
+) -> npt.NDArray[np.float64]:
+    """Sum weighted climate by location for every time step of a climate stack.
+
+    This is a sparse (location, climate pixel) by (climate pixel, time) matrix
+    product, with missing climate values contributing nothing. The stack is read
+    a chunk of time steps at a time, so a lazily loaded DataArray is never
+    decoded all at once.
+
+    Parameters
+    ----------
+    stack
+        A (time, y, x) stack of climate data, north-up.
+    location_index
+        The location position of each weight, sorted, as produced by
+        `build_location_weights`.
+    pixel_index
+        The flat climate pixel index of each weight.
+    weights
+        The weight of each (location, climate pixel) pair.
+    num_locations
+        The number of locations.
+    chunk_bytes
+        The target size in bytes of a chunk of time steps and its weighted values.
+
+    Returns
+    -------
+    npt.NDArray[np.float64]
+        The weighted climate sum with shape (time, location).
+    """
+    time_steps, height, width = stack.shape
+    sums = np.zeros((time_steps, num_locations), dtype=np.float64)
+    if not weights.size:
+        return sums
+    # The weights are sorted by location, so each location is a run of them.
+    starts = np.flatnonzero(np.diff(location_index, prepend=-1))
+    locations = location_index[starts]
+
+    step_bytes = height * width * np.dtype(np.float32).itemsize + weights.nbytes
+    chunk_steps = max(1, chunk_bytes // step_bytes)
+    for t0 in range(0, time_steps, chunk_steps):
+        t1 = min(t0 + chunk_steps, time_steps)
+        values = np.asarray(stack[t0:t1], dtype=np.float32).reshape(t1 - t0, -1)
+        weighted = values[:, pixel_index] * weights
+        weighted[np.isnan(weighted)] = 0.0
+        sums[t0:t1, locations] = np.add.reduceat(weighted, starts, axis=1)
+    return sums
+
+
 def aggregate_pop_to_hierarchy(
     data: pd.DataFrame, hierarchy: pd.DataFrame
 ) -> pd.DataFrame:
@@ -146,7 +555,9 @@ def aggregate_pop_to_hierarchy(
 
 
 def aggregate_climate_to_hierarchy(
-    data: pd.DataFrame, hierarchy: pd.DataFrame
+    data: pd.DataFrame,
+    hierarchy: pd.DataFrame,
+    index_columns: Sequence[str] = ("year_id", "scenario"),
 ) -> pd.DataFrame:
     """Create all aggregate climate values for a given hierarchy from most-detailed data.
 
@@ -156,6 +567,8 @@ def aggregate_climate_to_hierarchy(
         The most-detailed climate data to aggregate.
     hierarchy
         The hierarchy to aggregate the data to.
+    index_columns
+        The columns other than the location that identify a row of the data.
 
     Returns
     -------
@@ -175,7 +588,7 @@ def aggregate_climate_to_hierarchy(
         subset["parent_id"] = parent_map
 
         parent_values = (
-            subset.groupby(["year_id", "scenario", "parent_id"])[
+            subset.groupby([*index_columns, "parent_id"])[
                 ["weighted_climate", "population"]
             ]
             .sum()
@@ -190,7 +603,60 @@ def aggregate_climate_to_hierarchy(
     results = (
         results.drop(columns=["weighted_climate", "population"])
         .reset_index()
-        .sort_values(["location_id", "year_id"])
+        .sort_values(["location_id", *index_columns])
+        .reset_index(drop=True)
+    )
+    return results
+
+
+def aggregate_statistics_to_hierarchy(
+    data: pd.DataFrame,
+    hierarchy: pd.DataFrame,
+    aggregations: dict[str, str],
+    index_columns: Sequence[str] = ("year_id", "scenario"),
+) -> pd.DataFrame:
+    """Create all aggregate statistics for a given hierarchy from most-detailed data.
+
+    Parameters
+    ----------
+    data
+        The most-detailed statistics to aggregate.
+    hierarchy
+        The hierarchy to aggregate the data to.
+    aggregations
+        A mapping from each statistic column to how it is combined across
+        child locations (e.g. "sum", "min", "max").
+    index_columns
+        The columns other than the location that identify a row of the data.
+
+    Returns
+    -------
+    pd.DataFrame
+        The statistics with values for all levels of the hierarchy.
+    """
+    results = data.set_index("location_id").copy()
+
+    # Most detailed locations can be at multiple levels of the hierarchy,
+    # so we loop over all levels from most detailed to global, aggregating
+    # level by level and appending the results to the data.
+    for level in reversed(list(range(1, hierarchy.level.max() + 1))):
+        level_mask = hierarchy.level == level
+        parent_map = hierarchy.loc[level_mask].set_index("location_id").parent_id
+
+        subset = results.loc[parent_map.index]
+        subset["parent_id"] = parent_map
+
+        parent_values = (
+            subset.groupby([*index_columns, "parent_id"])
+            .agg(aggregations)
+            .reset_index()
+            .rename(columns={"parent_id": "location_id"})
+            .set_index("location_id")
+        )
+        results = pd.concat([results, parent_values])
+    results = (
+        results.reset_index()
+        .sort_values(["location_id", *index_columns])
         .reset_index(drop=True)
     )
     return results
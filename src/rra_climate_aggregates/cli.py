@@ -1,28 +1,49 @@
+import importlib
+from typing import Any
+
 import click
 
-from rra_climate_aggregates import (
-    aggregate,
-)
+# Pipeline stages, by command name. Each module exports the RUNNER and
+# TASK_RUNNER commands for its stage. Stage modules pull in the whole geospatial
+# stack, so they're only imported once one of their commands is invoked.
+STAGES = {
+    "aggregate": "rra_climate_aggregates.aggregate",
+    "climate_cache": "rra_climate_aggregates.climate_cache",
+    "population_cache": "rra_climate_aggregates.population_cache",
+}
 
 
-@click.group()
-def carun() -> None:
-    """Run a stage of the population modeling pipeline."""
+class LazyGroup(click.Group):
+    """A group whose subcommands are imported from their stage module on first use.
 
+    Parameters
+    ----------
+    command_attribute
+        The name of the attribute of each stage module holding the command to
+        register for the stage (e.g. "RUNNER").
+    """
 
-@click.group()
-def catask() -> None:
-    """Run an individual modeling task in the population modeling pipeline."""
+    def __init__(self, *args: Any, command_attribute: str, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.command_attribute = command_attribute
 
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *STAGES})
 
-for module in [aggregate]:
-    runner = getattr(module, "RUNNER", None)
-    task_runner = getattr(module, "TASK_RUNNER", None)
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in self.commands or cmd_name not in STAGES:
+            return super().get_command(ctx, cmd_name)
+        module = importlib.import_module(STAGES[cmd_name])
+        command: click.Command = getattr(module, self.command_attribute)
+        self.add_command(command, cmd_name)
+        return command
 
-    if not runner or not task_runner:
-        continue
 
-    command_name = module.__name__.split(".")[-1]
+@click.group(cls=LazyGroup, command_attribute="RUNNER")
+def carun() -> None:
+    """Run a stage of the population modeling pipeline."""
+
 
-    carun.add_command(runner, command_name)
-    catask.add_command(task_runner, command_name)
+@click.group(cls=LazyGroup, command_attribute="TASK_RUNNER")
+def catask() -> None:
+    """Run an individual modeling task in the population modeling pipeline."""
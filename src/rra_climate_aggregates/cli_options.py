@@ -90,6 +90,143 @@ def with_hierarchy[**P, T](
     )
 
 
+def with_time_resolution[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--time-resolution",
+        type=click.Choice(list(cac.TIME_RESOLUTIONS)),
+        default="annual",
+        show_default=True,
+        help="Temporal resolution of the climate data to aggregate.",
+    )
+
+
+def with_statistics[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--statistics",
+        type=click.STRING,
+        default="",
+        callback=_parse_statistics,
+        help=(
+            "Comma-separated additional statistics to compute. "
+            f"Any of: {', '.join(cac.STATISTICS)}."
+        ),
+    )
+
+
+def _parse_statistics(
+    _ctx: click.Context, _param: click.Parameter, value: str
+) -> list[str]:
+    statistics = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = set(statistics) - set(cac.STATISTICS)
+    if unknown:
+        msg = f"Unknown statistics: {sorted(unknown)}"
+        raise click.BadParameter(msg)
+    return statistics
+
+
+def with_histogram_bins[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--histogram-bins",
+        type=click.STRING,
+        default=None,
+        callback=_parse_bins,
+        help=(
+            "Comma-separated histogram bin edges. Defaults to the bins in the "
+            "HISTOGRAM_BINS constant for the measure."
+        ),
+    )
+
+
+def _parse_bins(
+    _ctx: click.Context, _param: click.Parameter, value: str | None
+) -> list[float] | None:
+    if value is None:
+        return None
+    try:
+        return sorted(float(edge) for edge in value.split(","))
+    except ValueError as e:
+        msg = f"Invalid bin edges: {value}"
+        raise click.BadParameter(msg) from e
+
+
+def with_population_cache_dir[**P, T](
+    *,
+    required: bool = False,
+) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--population-cache-dir",
+        type=click.Path(file_okay=False),
+        required=required,
+        default=None,
+        help=(
+            "Directory of the memory-mapped population cache. Must be a path "
+            "shared by the launcher and every task node."
+        ),
+    )
+
+
+def with_crop[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--crop",
+        is_flag=True,
+        help="Crop the population cache to the populated extent of the rasters.",
+    )
+
+
+def with_compression[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--compression",
+        type=click.Choice(cac.PARQUET_COMPRESSIONS),
+        default=cac.PARQUET_COMPRESSION,
+        show_default=True,
+        help="Compression codec of raw results and population files.",
+    )
+
+
+def with_compression_level[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--compression-level",
+        type=int,
+        default=None,
+        help=(
+            "Compression level of the codec. Defaults to "
+            f"{cac.PARQUET_COMPRESSION_LEVEL} for {cac.PARQUET_COMPRESSION} and to "
+            "the codec's own default otherwise."
+        ),
+    )
+
+
+def with_executor[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--executor",
+        type=click.Choice(cac.EXECUTORS),
+        default="jobmon",
+        show_default=True,
+        help="Backend to dispatch tasks with.",
+    )
+
+
+def with_climate_cache[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--climate-cache",
+        is_flag=True,
+        help=(
+            "Read annual climate data from the memory-mapped cache built by "
+            "`carun climate_cache`, where it matches the climate data."
+        ),
+    )
+
+
+def with_cache_encoding[**P, T]() -> Callable[[Callable[P, T]], Callable[P, T]]:
+    return click.option(
+        "--encoding",
+        type=click.Choice(cac.CLIMATE_CACHE_ENCODINGS),
+        default="float32",
+        show_default=True,
+        help="On-disk encoding of the cached climate data.",
+    )
+
+
 __all__ = [
     "RUN_ALL",
     "convert_choice",
@@ -0,0 +1,7 @@
+from rra_climate_aggregates.climate_cache.runner import (
+    climate_cache,
+    climate_cache_task,
+)
+
+RUNNER = climate_cache
+TASK_RUNNER = climate_cache_task
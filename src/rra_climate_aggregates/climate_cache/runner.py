@@ -0,0 +1,182 @@
+import itertools
+from collections.abc import Iterator
+from typing import Any
+
+import click
+import numpy as np
+import numpy.typing as npt
+import xarray as xr
+
+from rra_climate_aggregates import cli_options as clio
+from rra_climate_aggregates import constants as cac
+from rra_climate_aggregates import executor as cae
+from rra_climate_aggregates.data import (
+    ClimateAggregateData,
+    ClimateData,
+)
+from rra_climate_aggregates.utils import to_raster
+
+INT16_MISSING = np.iinfo(np.int16).min
+INT16_MAX = np.iinfo(np.int16).max
+
+
+def climate_cache_main(
+    scenario: str,
+    measure: str,
+    draw: str,
+    climate_data_root: str,
+    output_dir: str,
+    encoding: str,
+) -> None:
+    print(f"Caching {scenario} {measure} {draw} as {encoding}")
+    cd_data = ClimateData(climate_data_root)
+    ca_data = ClimateAggregateData(output_dir)
+
+    print("Loading climate data")
+    source = cd_data.annual_results_path(scenario, measure, draw).resolve()
+    source_mtime_ns = source.stat().st_mtime_ns
+    ds = cd_data.load_annual_results(scenario, measure, draw)
+    years = [int(year) for year in ds["year"].to_numpy()]
+    template = to_raster(ds.sel(year=years[0])["value"])
+
+    metadata: dict[str, Any] = {
+        "years": years,
+        "shape": list(template.shape),
+        "dtype": encoding,
+        "transform": list(template.transform)[:6],
+        "crs": "EPSG:4326",
+        # Checked by the aggregation tasks before using the cache.
+        "source": str(source),
+        "source_mtime_ns": source_mtime_ns,
+    }
+    if encoding == "int16":
+        scale, offset = int16_scale_offset(ds)
+        metadata |= {"scale": scale, "offset": offset}
+        slabs = (
+            encode_int16(slab, scale, offset) for slab in iter_year_slabs(ds, years)
+        )
+    else:
+        slabs = (slab.astype(np.float32) for slab in iter_year_slabs(ds, years))
+
+    print("Writing climate cache")
+    ca_data.save_climate_cache(slabs, metadata, scenario, measure, draw)
+
+
+def iter_year_slabs(ds: xr.Dataset, years: list[int]) -> Iterator[npt.NDArray[Any]]:
+    """Yield the north-up climate array for each year, one year at a time."""
+    for year in years:
+        yield to_raster(ds.sel(year=year)["value"])._ndarray  # noqa: SLF001
+
+
+def int16_scale_offset(ds: xr.Dataset) -> tuple[float, float]:
+    """Compute a scale and offset that map the data range onto int16.
+
+    The full range of the data is spread over [-INT16_MAX, INT16_MAX], leaving
+    the minimum int16 value free to represent missing data.
+    """
+    values = ds["value"]
+    vmin = float(values.min(skipna=True))
+    vmax = float(values.max(skipna=True))
+    offset = (vmax + vmin) / 2
+    scale = (vmax - vmin) / (2 * INT16_MAX) or 1.0
+    return scale, offset
+
+
+def encode_int16(
+    data: npt.NDArray[np.floating[Any]],
+    scale: float,
+    offset: float,
+) -> npt.NDArray[np.int16]:
+    """Encode float data as int16 with the given scale and offset."""
+    missing = np.isnan(data)
+    encoded = np.rint((data - offset) / scale)
+    encoded = np.clip(encoded, -INT16_MAX, INT16_MAX)
+    encoded[missing] = INT16_MISSING
+    result: npt.NDArray[np.int16] = encoded.astype(np.int16)
+    return result
+
+
+@click.command()
+@clio.with_scenario()
+@clio.with_measure()
+@clio.with_draw()
+@clio.with_input_directory("climate-data", cac.CLIMATE_DATA_ROOT)
+@clio.with_output_directory(cac.MODEL_ROOT)
+@clio.with_cache_encoding()
+def climate_cache_task(
+    scenario: str,
+    measure: str,
+    draw: str,
+    climate_data_dir: str,
+    output_dir: str,
+    encoding: str,
+) -> None:
+    climate_cache_main(
+        scenario,
+        measure,
+        draw,
+        climate_data_dir,
+        output_dir,
+        encoding,
+    )
+
+
+@click.command()
+@clio.with_scenario(allow_all=True)
+@clio.with_measure(allow_all=True)
+@clio.with_draw(allow_all=True)
+@clio.with_input_directory("climate-data", cac.CLIMATE_DATA_ROOT)
+@clio.with_output_directory(cac.MODEL_ROOT)
+@clio.with_cache_encoding()
+@clio.with_queue()
+@clio.with_executor()
+def climate_cache(
+    scenario: list[str],
+    measure: list[str],
+    draw: list[str],
+    climate_data_dir: str,
+    output_dir: str,
+    encoding: str,
+    queue: str,
+    executor: str,
+) -> None:
+    cd_data = ClimateData(climate_data_dir)
+    ca_data = ClimateAggregateData(output_dir)
+
+    jobs = []
+    for s, m, d in itertools.product(scenario, measure, draw):
+        # Rebuild caches of stale NetCDFs, and caches in another encoding.
+        source = cd_data.annual_results_path(s, m, d)
+        is_done = (
+            ca_data.climate_cache_is_current(s, m, d, source)
+            and ca_data.load_climate_cache_metadata(s, m, d)["dtype"] == encoding
+        )
+        if not is_done:
+            jobs.append((s, m, d))
+    jobs = list(set(jobs))
+
+    print(f"Running {len(jobs)} jobs")
+
+    cae.run_parallel(
+        executor,
+        runner="catask",
+        task_name="climate_cache",
+        flat_node_args=(
+            ("scenario", "measure", "draw"),
+            jobs,
+        ),
+        task_args={
+            "climate-data-dir": climate_data_dir,
+            "output-dir": output_dir,
+            "encoding": encoding,
+        },
+        task_resources={
+            "queue": queue,
+            "cores": 1,
+            "memory": "20G",
+            "runtime": "60m",
+            "project": "proj_rapidresponse",
+        },
+        log_root=ca_data.log_dir("climate_cache"),
+        max_attempts=3,
+    )
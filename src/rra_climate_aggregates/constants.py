@@ -32,6 +32,72 @@ DRAWS = [f"{d:>03}" for d in range(100)]
 
 YEARS = list(range(1950, 2101))
 
+# Number of years aggregated between checkpoints of a task's intermediate results.
+CHECKPOINT_YEARS = 10
+
+# Parquet settings for raw results and population. Files are sorted by location
+# and year, so row-group statistics let readers skip most of a file when
+# filtering by location.
+PARQUET_COMPRESSION = "zstd"
+PARQUET_COMPRESSION_LEVEL = 9
+PARQUET_COMPRESSIONS = [
+    "zstd",
+    "gzip",
+    "brotli",
+    "lz4",
+    "snappy",
+    "none",
+]
+# Codecs that don't take a compression level.
+PARQUET_COMPRESSIONS_WITHOUT_LEVEL = [
+    "snappy",
+    "none",
+]
+PARQUET_ROW_GROUP_SIZE = 2**17
+
+# Additional per-location statistics that can be computed alongside the
+# population-weighted mean.
+STATISTICS = [
+    "population_histogram",
+    "area_weighted_mean",
+    "climate_range",
+]
+
+# Default bin edges for population histograms of each measure.
+HISTOGRAM_BINS = {
+    "mean_temperature": list(range(-30, 41)),
+    "mean_high_temperature": list(range(-25, 51)),
+    "mean_low_temperature": list(range(-40, 36)),
+    "days_over_30C": [1, 7, 14, 30, 60, 90, 120, 150, 180, 240, 300, 365],
+    "malaria_suitability": [1, *range(30, 366, 30)],
+    "dengue_suitability": [1, *range(30, 366, 30)],
+    "wind_speed": list(range(21)),
+    "relative_humidity": list(range(0, 101, 5)),
+    "total_precipitation": [100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000],
+    "precipitation_days": list(range(0, 366, 15)),
+}
+
+# Temporal resolutions we can aggregate at, mapped to the maximum number of
+# time steps in a year.
+TIME_RESOLUTIONS = {
+    "annual": 1,
+    "monthly": 12,
+    "daily": 366,
+}
+
+# Backends that can dispatch the tasks of a pipeline stage.
+EXECUTORS = [
+    "jobmon",
+    "local",
+]
+
+# On-disk encodings for the climate cache. int16 data is stored with a per-draw
+# scale and offset.
+CLIMATE_CACHE_ENCODINGS = [
+    "float32",
+    "int16",
+]
+
 # Mapping between pixel aggregation hierarchies to location aggregation hierarchies.
 # The pixel aggregation hierarchies are the most detailed shapes used to
 # aggregate the pixel data to the location level.
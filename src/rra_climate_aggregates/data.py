@@ -1,10 +1,19 @@
+import json
+import shutil
+from collections.abc import Iterable
 from pathlib import Path
+from typing import Any
 
 import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import rasterra as rt
 import shapely
 import xarray as xr
+from affine import Affine
 from rra_tools.shell_tools import mkdir, touch
 
 from rra_climate_aggregates import constants as cac
@@ -13,6 +22,23 @@ from rra_climate_aggregates import constants as cac
 type Polygon = shapely.Polygon | shapely.MultiPolygon
 type BBox = tuple[float, float, float, float]
 type Bounds = BBox | Polygon
+type Filters = list[tuple[str, str, Any]]
+
+# Storage types for the columns of raw results. Location and year ids fit easily
+# in 32 and 16 bits, climate values don't need more than single precision, and
+# the scenario is dictionary encoded rather than repeated in every row. Columns
+# not listed keep the type inferred from the data.
+RAW_RESULTS_TYPES = {
+    "location_id": pa.int32(),
+    "year_id": pa.int16(),
+    "time_step": pa.int16(),
+    "scenario": pa.dictionary(pa.int8(), pa.string()),
+    "value": pa.float32(),
+}
+# Population totals of large locations are beyond float32 precision.
+POPULATION_TYPES = {**RAW_RESULTS_TYPES, "value": pa.float64()}
+# Compact files are sorted by these columns (where present).
+SORT_COLUMNS = ["location_id", "year_id", "time_step"]
 
 
 class PopulationModelData:
@@ -30,10 +56,76 @@ class PopulationModelData:
     def results(self) -> Path:
         return Path(self.root, "results") / "current" / "wgs84_0p01"
 
+    def results_path(self, time_point: str) -> Path:
+        return self.results / f"{time_point}.tif"
+
     def load_results(self, time_point: str) -> rt.RasterArray:
-        path = self.results / f"{time_point}.tif"
+        path = self.results_path(time_point)
         return rt.load_raster(path)
 
+    def population_cache_path(self, cache_root: str | Path) -> Path:
+        return Path(cache_root) / "population.npy"
+
+    def population_cache_metadata_path(self, cache_root: str | Path) -> Path:
+        return self.population_cache_path(cache_root).with_suffix(".json")
+
+    def save_population_cache(
+        self,
+        slabs: Iterable[npt.NDArray[np.float32]],
+        metadata: dict[str, Any],
+        cache_root: str | Path,
+    ) -> None:
+        """Write a (year, y, x) float32 stack of decoded population rasters.
+
+        The metadata must include the ``years``, ``shape``, ``dtype``,
+        ``transform`` and ``crs`` of the stack, and the ``window`` (row start, row
+        stop, column start, column stop) of the full raster grid the stack covers.
+        """
+        _save_stack(
+            slabs,
+            metadata,
+            self.population_cache_path(cache_root),
+            self.population_cache_metadata_path(cache_root),
+        )
+
+    def load_population_cache_metadata(self, cache_root: str | Path) -> dict[str, Any]:
+        path = self.population_cache_metadata_path(cache_root)
+        return json.loads(path.read_text())  # type: ignore[no-any-return]
+
+    def population_cache_is_current(self, cache_root: str | Path) -> bool:
+        """Check the population cache exists and was built from this model."""
+        cache_paths = [
+            self.population_cache_path(cache_root),
+            self.population_cache_metadata_path(cache_root),
+        ]
+        if not all(path.exists() for path in cache_paths):
+            return False
+        metadata = self.load_population_cache_metadata(cache_root)
+        return bool(metadata.get("population_model_root") == str(self.root.resolve()))
+
+    def population_cache_window(self, cache_root: str | Path) -> tuple[slice, slice]:
+        """Get the window of the full raster grid covered by the population cache."""
+        metadata = self.load_population_cache_metadata(cache_root)
+        row_start, row_stop, col_start, col_stop = metadata["window"]
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def load_population_cache(
+        self, cache_root: str | Path, year: int
+    ) -> rt.RasterArray:
+        """Load a year of population as a zero-copy view of the population cache.
+
+        Every reader maps the same file, so concurrent jobs on a node share the
+        OS page cache rather than each decoding the GeoTIFFs.
+        """
+        metadata = self.load_population_cache_metadata(cache_root)
+        data = np.load(self.population_cache_path(cache_root), mmap_mode="r")
+        return rt.RasterArray(
+            data=data[metadata["years"].index(year)],
+            transform=Affine(*metadata["transform"]),
+            crs=metadata["crs"],
+            no_data_value=np.nan,
+        )
+
     @property
     def raking_data(self) -> Path:
         return self.root / "admin-inputs" / "raking"
@@ -106,13 +198,42 @@ class ClimateData:
         ds = ds.rio.write_crs("EPSG:4326")
         return ds
 
+    def subannual_results_path(
+        self, time_resolution: str, scenario: str, measure: str, draw: str, year: int
+    ) -> Path:
+        root = self.results / time_resolution / scenario / measure / draw
+        return root / f"{year}.nc"
+
+    def load_subannual_results(
+        self, time_resolution: str, scenario: str, measure: str, draw: str, year: int
+    ) -> xr.Dataset:
+        path = self.subannual_results_path(
+            time_resolution, scenario, measure, draw, year
+        )
+        ds = xr.open_dataset(path, decode_coords="all")
+        ds = ds.rio.write_crs("EPSG:4326")
+        return ds
+
 
 class ClimateAggregateData:
     def __init__(
         self,
         root: str | Path = cac.MODEL_ROOT,
+        compression: str = cac.PARQUET_COMPRESSION,
+        compression_level: int | None = None,
     ) -> None:
+        # The default codec gets our default level, other codecs their own.
+        if compression_level is None and compression == cac.PARQUET_COMPRESSION:
+            compression_level = cac.PARQUET_COMPRESSION_LEVEL
+        if (
+            compression_level is not None
+            and compression in cac.PARQUET_COMPRESSIONS_WITHOUT_LEVEL
+        ):
+            msg = f"Compression {compression} doesn't take a compression level."
+            raise ValueError(msg)
         self._root = Path(root)
+        self._compression = compression
+        self._compression_level = compression_level
         self._create_model_root()
 
     def _create_model_root(self) -> None:
@@ -130,6 +251,131 @@ class ClimateAggregateData:
     def log_dir(self, step_name: str) -> Path:
         return self.logs / step_name
 
+    @property
+    def telemetry(self) -> Path:
+        return self.root / "telemetry"
+
+    def telemetry_path(
+        self,
+        step_name: str,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+    ) -> Path:
+        root = self.telemetry / step_name / version
+        return root / f"{hierarchy}_{scenario}_{measure}_{draw}.json"
+
+    def save_telemetry(
+        self,
+        record: dict[str, Any],
+        step_name: str,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+    ) -> None:
+        path = self.telemetry_path(
+            step_name, version, hierarchy, scenario, measure, draw
+        )
+        mkdir(path.parent, exist_ok=True, parents=True)
+        touch(path, clobber=True)
+        path.write_text(json.dumps(record))
+
+    def load_telemetry(self, step_name: str) -> pd.DataFrame:
+        records = [
+            json.loads(path.read_text())
+            for path in (self.telemetry / step_name).glob("*/*.json")
+        ]
+        return pd.DataFrame(records)
+
+    @property
+    def climate_cache(self) -> Path:
+        return self.root / "climate-cache"
+
+    def climate_cache_path(self, scenario: str, measure: str, draw: str) -> Path:
+        return self.climate_cache / scenario / measure / f"{draw}.npy"
+
+    def climate_cache_metadata_path(
+        self, scenario: str, measure: str, draw: str
+    ) -> Path:
+        return self.climate_cache_path(scenario, measure, draw).with_suffix(".json")
+
+    def save_climate_cache(
+        self,
+        slabs: Iterable[npt.NDArray[Any]],
+        metadata: dict[str, Any],
+        scenario: str,
+        measure: str,
+        draw: str,
+    ) -> None:
+        """Write a year-contiguous (year, y, x) array of annual climate results.
+
+        The slabs are streamed into an uncompressed ``.npy`` file so readers can
+        memory-map a single year without touching the rest of the file. The
+        metadata must include the ``years``, ``shape``, ``dtype``, ``transform``
+        and ``crs`` of the data, the ``scale`` and ``offset`` for int16 data, and
+        the ``source`` NetCDF and its ``source_mtime_ns``.
+        The array is written to a temporary file and renamed into place, so the
+        cache only exists once it is complete.
+        """
+        _save_stack(
+            slabs,
+            metadata,
+            self.climate_cache_path(scenario, measure, draw),
+            self.climate_cache_metadata_path(scenario, measure, draw),
+        )
+
+    def load_climate_cache_metadata(
+        self, scenario: str, measure: str, draw: str
+    ) -> dict[str, Any]:
+        path = self.climate_cache_metadata_path(scenario, measure, draw)
+        return json.loads(path.read_text())  # type: ignore[no-any-return]
+
+    def climate_cache_is_current(
+        self, scenario: str, measure: str, draw: str, source: Path
+    ) -> bool:
+        """Check the climate cache exists and was built from the current source."""
+        cache_paths = [
+            self.climate_cache_path(scenario, measure, draw),
+            self.climate_cache_metadata_path(scenario, measure, draw),
+        ]
+        if not all(path.exists() for path in cache_paths):
+            return False
+        metadata = self.load_climate_cache_metadata(scenario, measure, draw)
+        source = source.resolve()
+        return bool(
+            metadata.get("source") == str(source)
+            and metadata.get("source_mtime_ns") == source.stat().st_mtime_ns
+        )
+
+    def load_climate_cache(
+        self, scenario: str, measure: str, draw: str, year: int
+    ) -> rt.RasterArray:
+        """Load a single year of cached annual climate results.
+
+        Float32 caches are returned as a zero-copy view of the memory-mapped file.
+        Int16 caches are decoded to float32, with the minimum int16 value as NaN.
+        """
+        metadata = self.load_climate_cache_metadata(scenario, measure, draw)
+        data = np.load(self.climate_cache_path(scenario, measure, draw), mmap_mode="r")
+        slab = data[metadata["years"].index(year)]
+
+        if metadata["dtype"] == "int16":
+            missing = slab == np.iinfo(np.int16).min
+            slab = slab.astype(np.float32) * np.float32(metadata["scale"])
+            slab += np.float32(metadata["offset"])
+            slab[missing] = np.nan
+
+        return rt.RasterArray(
+            data=slab,
+            transform=Affine(*metadata["transform"]),
+            crs=metadata["crs"],
+            no_data_value=np.nan,
+        )
+
     def version_root(self, version: str) -> Path:
         return self.root / version
 
@@ -152,14 +398,179 @@ class ClimateAggregateData:
         draw: str,
     ) -> None:
         path = self.raw_results_path(version, hierarchy, scenario, measure, draw)
-        mkdir(path.parent, exist_ok=True, parents=True)
-        touch(path, clobber=True)
-        df.to_parquet(path)
+        # Written atomically, as the existence of raw results marks a task done.
+        self._save_compact(df, path, RAW_RESULTS_TYPES)
 
     def load_raw_results(
         self, version: str, hierarchy: str, scenario: str, measure: str, draw: str
     ) -> pd.DataFrame:
         path = self.raw_results_path(version, hierarchy, scenario, measure, draw)
+        return _load_parquet(path)
+
+    def subannual_raw_results_path(
+        self,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+        time_resolution: str,
+        year: int,
+    ) -> Path:
+        root = self.raw_results_root(version) / hierarchy / scenario / measure
+        return root / time_resolution / draw / f"{year}.parquet"
+
+    def save_subannual_raw_results(
+        self,
+        df: pd.DataFrame,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+        time_resolution: str,
+        year: int,
+    ) -> None:
+        path = self.subannual_raw_results_path(
+            version, hierarchy, scenario, measure, draw, time_resolution, year
+        )
+        self._save_compact(df, path, RAW_RESULTS_TYPES)
+
+    def load_subannual_raw_results(
+        self,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+        time_resolution: str,
+        year: int,
+    ) -> pd.DataFrame:
+        path = self.subannual_raw_results_path(
+            version, hierarchy, scenario, measure, draw, time_resolution, year
+        )
+        return _load_parquet(path)
+
+    def checkpoint_root(
+        self, version: str, hierarchy: str, scenario: str, measure: str, draw: str
+    ) -> Path:
+        root = self.raw_results_root(version) / ".checkpoints"
+        return root / hierarchy / scenario / measure / draw
+
+    def save_checkpoint(
+        self,
+        df: pd.DataFrame,
+        kind: str,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+    ) -> None:
+        """Save a part of the checkpoint of a kind of intermediate result.
+
+        Parts are keyed by the first year they cover, so a part redone after a
+        failure overwrites the partial one rather than duplicating it.
+        """
+        root = self.checkpoint_root(version, hierarchy, scenario, measure, draw)
+        first_year = df.year_id.min()
+        _save_parquet_atomic(df, root / f"{kind}_{first_year}.parquet")
+
+    def load_checkpoint(
+        self,
+        kind: str,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+    ) -> list[pd.DataFrame]:
+        """Load all checkpointed parts of a kind of intermediate result."""
+        root = self.checkpoint_root(version, hierarchy, scenario, measure, draw)
+        return [
+            pd.read_parquet(path) for path in sorted(root.glob(f"{kind}_*.parquet"))
+        ]
+
+    def checkpoint_config_path(
+        self, version: str, hierarchy: str, scenario: str, measure: str, draw: str
+    ) -> Path:
+        root = self.checkpoint_root(version, hierarchy, scenario, measure, draw)
+        return root / "config.json"
+
+    def save_checkpoint_config(
+        self,
+        config: dict[str, Any],
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+    ) -> None:
+        """Record the configuration the checkpointed parts are computed with."""
+        path = self.checkpoint_config_path(version, hierarchy, scenario, measure, draw)
+        mkdir(path.parent, exist_ok=True, parents=True)
+        touch(path, clobber=True)
+        path.write_text(json.dumps(config))
+
+    def load_checkpoint_config(
+        self, version: str, hierarchy: str, scenario: str, measure: str, draw: str
+    ) -> dict[str, Any] | None:
+        """Load the checkpoint configuration, or None if there isn't one."""
+        path = self.checkpoint_config_path(version, hierarchy, scenario, measure, draw)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())  # type: ignore[no-any-return]
+
+    def clear_checkpoint(
+        self, version: str, hierarchy: str, scenario: str, measure: str, draw: str
+    ) -> None:
+        root = self.checkpoint_root(version, hierarchy, scenario, measure, draw)
+        shutil.rmtree(root, ignore_errors=True)
+
+    def raw_statistics_root(self, version: str) -> Path:
+        return self.version_root(version) / "raw-statistics"
+
+    def raw_statistics_path(
+        self,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+        statistic: str,
+    ) -> Path:
+        root = self.raw_statistics_root(version)
+        return root / hierarchy / scenario / measure / statistic / f"{draw}.parquet"
+
+    def save_raw_statistics(
+        self,
+        df: pd.DataFrame,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+        statistic: str,
+    ) -> None:
+        path = self.raw_statistics_path(
+            version, hierarchy, scenario, measure, draw, statistic
+        )
+        mkdir(path.parent, exist_ok=True, parents=True)
+        touch(path, clobber=True)
+        df.to_parquet(path)
+
+    def load_raw_statistics(
+        self,
+        version: str,
+        hierarchy: str,
+        scenario: str,
+        measure: str,
+        draw: str,
+        statistic: str,
+    ) -> pd.DataFrame:
+        path = self.raw_statistics_path(
+            version, hierarchy, scenario, measure, draw, statistic
+        )
         return pd.read_parquet(path)
 
     def results_root(self, version: str) -> Path:
@@ -170,9 +581,7 @@ class ClimateAggregateData:
 
     def save_population(self, df: pd.DataFrame, version: str, hierarchy: str) -> None:
         path = self.population_path(version, hierarchy)
-        mkdir(path.parent, exist_ok=True, parents=True)
-        touch(path, clobber=True)
-        df.to_parquet(path)
+        self._save_compact(df, path, POPULATION_TYPES)
 
     def load_population(
         self, version: str, hierarchy: str, location_id: int | None = None
@@ -180,8 +589,56 @@ class ClimateAggregateData:
         path = self.population_path(version, hierarchy)
         if location_id is not None:
             filters = [("location_id", "==", location_id)]
-            return pd.read_parquet(path, filters=filters)
-        return pd.read_parquet(path)
+            return _load_parquet(path, filters)
+        return _load_parquet(path)
+
+    def migrate_raw_results(self, version: str) -> int:
+        """Rewrite a version's raw results and population in the compact format.
+
+        Files written before raw results had an explicit schema are still read by
+        `load_raw_results` and `load_population`, with their stored types. Once
+        migrated, they are read with the compact types instead.
+
+        Parameters
+        ----------
+        version
+            The version to migrate.
+
+        Returns
+        -------
+        int
+            The number of files rewritten.
+        """
+        paths = [
+            (path, RAW_RESULTS_TYPES)
+            for path in sorted(self.raw_results_root(version).rglob("*.parquet"))
+            if ".checkpoints" not in path.parts
+        ]
+        paths += [
+            (path, POPULATION_TYPES)
+            for path in sorted(self.results_root(version).glob("*/population.parquet"))
+        ]
+
+        migrated = 0
+        for path, types in paths:
+            if not _is_compact(path, types):
+                self._save_compact(_load_parquet(path), path, types)
+                migrated += 1
+        return migrated
+
+    def _save_compact(
+        self, df: pd.DataFrame, path: Path, types: dict[str, pa.DataType]
+    ) -> None:
+        sort_columns = [column for column in SORT_COLUMNS if column in df]
+        table = pa.Table.from_pandas(df.sort_values(sort_columns), preserve_index=False)
+        _save_parquet_atomic(
+            _to_compact(table, types),
+            path,
+            compression=self._compression,
+            compression_level=self._compression_level,
+            row_group_size=cac.PARQUET_ROW_GROUP_SIZE,
+            write_statistics=True,
+        )
 
     def results_path(
         self, version: str, hierarchy: str, scenario: str, measure: str
@@ -214,3 +671,86 @@ class ClimateAggregateData:
             filters = [("location_id", "==", location_id)]
             return pd.read_parquet(path, filters=filters)
         return pd.read_parquet(path)
+
+
+def _save_stack(
+    slabs: Iterable[npt.NDArray[Any]],
+    metadata: dict[str, Any],
+    path: Path,
+    metadata_path: Path,
+) -> None:
+    """Stream slabs into an uncompressed (year, y, x) ``.npy`` file.
+
+    The array is written to a temporary file and renamed into place along with
+    its JSON metadata, so the stack only exists once it is complete.
+    """
+    mkdir(path.parent, exist_ok=True, parents=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+
+    out = np.lib.format.open_memmap(  # type: ignore[no-untyped-call]
+        tmp_path,
+        mode="w+",
+        dtype=metadata["dtype"],
+        shape=(len(metadata["years"]), *metadata["shape"]),
+    )
+    for i, slab in enumerate(slabs):
+        out[i] = slab
+    out.flush()
+    del out
+
+    touch(metadata_path, clobber=True)
+    metadata_path.write_text(json.dumps(metadata))
+    tmp_path.replace(path)
+
+
+def _save_parquet_atomic(
+    df: pd.DataFrame | pa.Table, path: Path, **kwargs: Any
+) -> None:
+    """Write a parquet file to a temporary name and rename it into place."""
+    mkdir(path.parent, exist_ok=True, parents=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    touch(tmp_path, clobber=True)
+    if isinstance(df, pa.Table):
+        pq.write_table(df, tmp_path, **kwargs)
+    else:
+        df.to_parquet(tmp_path, **kwargs)
+    tmp_path.replace(path)
+
+
+def _to_compact(table: pa.Table, types: dict[str, pa.DataType]) -> pa.Table:
+    """Cast a table to compact storage types, dropping any stored pandas index."""
+    columns = [c for c in table.column_names if not c.startswith("__index_level_")]
+    table = table.select(columns)
+    schema = pa.schema(
+        [(field.name, types.get(field.name, field.type)) for field in table.schema]
+    )
+    return table.cast(schema)
+
+
+def _load_parquet(path: Path, filters: Filters | None = None) -> pd.DataFrame:
+    """Load a parquet file with its stored types, dropping any stored pandas index.
+
+    Legacy files (int64 ids, float64 values, plain string scenarios) keep their
+    types; only files written in the compact format have the compact types.
+    """
+    table = pq.read_table(path, filters=filters)
+    columns = [c for c in table.column_names if not c.startswith("__index_level_")]
+    df: pd.DataFrame = table.select(columns).to_pandas()
+    return df
+
+
+def _is_compact(path: Path, types: dict[str, pa.DataType]) -> bool:
+    schema = pq.read_schema(path)
+    return all(
+        _same_storage_type(field.type, types.get(field.name, field.type))
+        and not field.name.startswith("__index_level_")
+        for field in schema
+    )
+
+
+def _same_storage_type(stored: pa.DataType, expected: pa.DataType) -> bool:
+    # Parquet doesn't keep the index type of dictionary columns, they're always
+    # read back with int32 indices.
+    if pa.types.is_dictionary(stored) and pa.types.is_dictionary(expected):
+        return stored.value_type == expected.value_type  # type: ignore[no-any-return]
+    return stored == expected  # type: ignore[no-any-return]
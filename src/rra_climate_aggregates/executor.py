@@ -0,0 +1,259 @@
+import os
+import re
+import shlex
+import subprocess
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import tqdm
+from rra_tools.shell_tools import mkdir
+
+_MEMORY_UNITS = {"K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+_UNSAFE_LOG_CHARACTERS = re.compile(r"[^A-Za-z0-9._-]+")
+
+type TaskResources = dict[str, str | int]
+# A command to run locally, its log name, and the cores and memory it needs.
+type LocalTask = tuple[list[str], str, int, int]
+
+
+def run_parallel(
+    executor: str,
+    runner: str,
+    task_name: str,
+    flat_node_args: tuple[tuple[str, ...], Sequence[tuple[str, ...]]],
+    task_args: Mapping[str, str | None],
+    task_resources: TaskResources,
+    log_root: Path,
+    max_attempts: int = 3,
+    per_task_resources: Callable[[tuple[str, ...]], TaskResources] | None = None,
+) -> None:
+    """Run a set of tasks with the requested executor.
+
+    All tasks are submitted together, as a single Jobmon workflow or a single
+    local pool, even when their resource requests differ.
+
+    Parameters
+    ----------
+    executor
+        The executor to use. Must be one of the EXECUTORS constant.
+    runner
+        The name of the task CLI entry point (e.g. "catask").
+    task_name
+        The name of the task subcommand to run.
+    flat_node_args
+        A tuple whose first element is the names of the per-task arguments and whose
+        second element is a sequence of per-task argument values.
+    task_args
+        Arguments shared by all tasks.
+    task_resources
+        Resources requested by each task. The local executor uses the cores and
+        memory to decide which tasks to run at once.
+    log_root
+        Directory to write task logs to.
+    max_attempts
+        The number of times to try a task before giving up on it.
+    per_task_resources
+        An optional function mapping the per-task argument values of a task to
+        the resources it needs. These are merged over `task_resources`, so only
+        the resources that vary between tasks need to be returned.
+    """
+    if executor == "jobmon":
+        # Jobmon is slow to import and unused by the local executor.
+        from rra_tools import jobmon
+
+        jobmon.run_parallel(
+            runner=runner,
+            task_name=task_name,
+            flat_node_args=flat_node_args,
+            task_args=dict(task_args),
+            task_resources=task_resources,
+            per_task_resources=per_task_resources,
+            log_root=log_root,
+            max_attempts=max_attempts,
+        )
+    elif executor == "local":
+        run_local(
+            runner=runner,
+            task_name=task_name,
+            flat_node_args=flat_node_args,
+            task_args=task_args,
+            task_resources=task_resources,
+            log_root=log_root,
+            max_attempts=max_attempts,
+            per_task_resources=per_task_resources,
+        )
+    else:
+        msg = f"Unknown executor: {executor}"
+        raise ValueError(msg)
+
+
+def run_local(
+    runner: str,
+    task_name: str,
+    flat_node_args: tuple[tuple[str, ...], Sequence[tuple[str, ...]]],
+    task_args: Mapping[str, str | None],
+    task_resources: TaskResources,
+    log_root: Path,
+    max_attempts: int = 3,
+    per_task_resources: Callable[[tuple[str, ...]], TaskResources] | None = None,
+) -> None:
+    """Run a set of tasks as subprocesses on the local machine.
+
+    Each task runs as its own ``{runner} {task_name}`` process, exactly as it
+    would under Jobmon. Tasks of any size are packed onto the machine against a
+    shared budget of its cores and memory, and failed tasks are retried up to
+    ``max_attempts`` times.
+
+    Parameters
+    ----------
+    runner
+        The name of the task CLI entry point (e.g. "catask").
+    task_name
+        The name of the task subcommand to run.
+    flat_node_args
+        A tuple whose first element is the names of the per-task arguments and whose
+        second element is a sequence of per-task argument values.
+    task_args
+        Arguments shared by all tasks. Arguments with a value of None are
+        passed as flags.
+    task_resources
+        Resources requested by each task. Only the cores and memory are used.
+    log_root
+        Directory to write task logs to.
+    max_attempts
+        The number of times to try a task before giving up on it.
+    per_task_resources
+        An optional function mapping the per-task argument values of a task to
+        the resources it needs, merged over `task_resources`.
+
+    Raises
+    ------
+    RuntimeError
+        If any task fails on all of its attempts.
+    """
+    node_arg_names, node_arg_values = flat_node_args
+    tasks: list[LocalTask] = []
+    for values in node_arg_values:
+        node_args = dict(zip(node_arg_names, values, strict=True))
+        command = [runner, task_name]
+        for name, value in {**node_args, **task_args}.items():
+            command.append(f"--{name}")
+            if value is not None:
+                command.append(str(value))
+        resources = task_resources
+        if per_task_resources is not None:
+            resources = {**task_resources, **per_task_resources(values)}
+        cores, memory = task_cores_memory(resources)
+        tasks.append((command, log_name(task_name, values), cores, memory))
+
+    available_cores, available_memory = available_resources()
+    print(
+        f"Running {len(tasks)} tasks locally on {available_cores} cores "
+        f"and {available_memory / 2**30:.0f}G of memory"
+    )
+
+    mkdir(log_root, exist_ok=True, parents=True)
+    failed = _run_packed(
+        tasks, available_cores, available_memory, log_root, max_attempts
+    )
+
+    if failed:
+        msg = (
+            f"{len(failed)} of {len(tasks)} tasks failed after {max_attempts} "
+            f"attempts. See logs in {log_root}: {sorted(failed)}"
+        )
+        raise RuntimeError(msg)
+
+
+def available_resources() -> tuple[int, int]:
+    """Get the cores and memory in bytes available to tasks on this machine."""
+    available_cores = len(os.sched_getaffinity(0))
+    available_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return available_cores, available_memory
+
+
+def task_cores_memory(task_resources: TaskResources) -> tuple[int, int]:
+    """Get the cores and memory in bytes requested by a task."""
+    cores = int(task_resources.get("cores", 1))
+    memory = parse_memory(str(task_resources.get("memory", "1G")))
+    return cores, memory
+
+
+def log_name(task_name: str, values: Sequence[str]) -> str:
+    """Build a log file name for a task from its name and per-task arguments.
+
+    Arguments may be paths, so anything that isn't safe in a file name is
+    replaced with an underscore.
+    """
+    return _UNSAFE_LOG_CHARACTERS.sub("_", "_".join([task_name, *values]))
+
+
+def parse_memory(memory: str) -> int:
+    """Convert a scheduler memory string like "30G" to a number of bytes."""
+    memory = memory.strip().upper().removesuffix("B")
+    if memory and memory[-1] in _MEMORY_UNITS:
+        return int(float(memory[:-1]) * _MEMORY_UNITS[memory[-1]])
+    return int(memory)
+
+
+def _run_packed(
+    tasks: list[LocalTask],
+    available_cores: int,
+    available_memory: int,
+    log_root: Path,
+    max_attempts: int,
+) -> list[str]:
+    """Run tasks as soon as they fit in the free cores and memory.
+
+    Pending tasks are started in order whenever they fit, so small tasks fill in
+    around large ones. A task larger than the whole machine is run on its own.
+    Returns the log names of the tasks that failed.
+    """
+    free_cores, free_memory = available_cores, available_memory
+    pending = list(tasks)
+    running: dict[Future[bool], LocalTask] = {}
+    failed = []
+    with (
+        ThreadPoolExecutor(max_workers=max(len(tasks), 1)) as pool,
+        tqdm.tqdm(total=len(tasks)) as pbar,
+    ):
+        while pending or running:
+            for task in list(pending):
+                command, name, cores, memory = task
+                fits = cores <= free_cores and memory <= free_memory
+                if fits or not running:
+                    pending.remove(task)
+                    future = pool.submit(
+                        _run_with_retries, command, log_root / name, max_attempts
+                    )
+                    running[future] = task
+                    free_cores -= cores
+                    free_memory -= memory
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, name, cores, memory = running.pop(future)
+                free_cores += cores
+                free_memory += memory
+                if not future.result():
+                    failed.append(name)
+                pbar.update()
+    return failed
+
+
+def _run_with_retries(command: list[str], log_stem: Path, max_attempts: int) -> bool:
+    for attempt in range(1, max_attempts + 1):
+        log_path = log_stem.with_name(f"{log_stem.name}.{attempt}.log")
+        with log_path.open("w") as log_file:
+            log_file.write(f"{shlex.join(command)}\n")
+            log_file.flush()
+            result = subprocess.run(  # noqa: S603
+                command,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                check=False,
+            )
+        if result.returncode == 0:
+            return True
+    return False
@@ -0,0 +1,7 @@
+from rra_climate_aggregates.population_cache.runner import (
+    population_cache,
+    population_cache_task,
+)
+
+RUNNER = population_cache
+TASK_RUNNER = population_cache_task
@@ -0,0 +1,182 @@
+from collections.abc import Iterator
+
+import click
+import numpy as np
+import numpy.typing as npt
+import rasterio
+import tqdm
+
+from rra_climate_aggregates import cli_options as clio
+from rra_climate_aggregates import constants as cac
+from rra_climate_aggregates import executor as cae
+from rra_climate_aggregates.data import (
+    ClimateAggregateData,
+    PopulationModelData,
+)
+
+
+def population_cache_main(
+    population_model_root: str,
+    cache_dir: str,
+    *,
+    crop: bool = False,
+    progress_bar: bool = False,
+) -> None:
+    print(f"Caching population rasters in {cache_dir}")
+    pm_data = PopulationModelData(population_model_root)
+    years = cac.YEARS
+
+    with rasterio.open(pm_data.results_path(f"{years[0]}q1")) as template:
+        transform = template.transform
+        crs = template.crs.to_string()
+        height, width = template.height, template.width
+
+    if crop:
+        print("Finding populated extent")
+        rows, cols = populated_window(
+            pm_data, years, (height, width), progress_bar=progress_bar
+        )
+    else:
+        rows, cols = slice(0, height), slice(0, width)
+
+    window_transform = transform * transform.translation(cols.start, rows.start)
+    metadata = {
+        "years": years,
+        "shape": [rows.stop - rows.start, cols.stop - cols.start],
+        "dtype": "float32",
+        "transform": list(window_transform)[:6],
+        "crs": crs,
+        "window": [rows.start, rows.stop, cols.start, cols.stop],
+        # Checked by the aggregation tasks before using the cache.
+        "population_model_root": str(pm_data.root.resolve()),
+    }
+
+    print("Writing population cache")
+    pm_data.save_population_cache(
+        iter_population_slabs(pm_data, years, rows, cols, progress_bar=progress_bar),
+        metadata,
+        cache_dir,
+    )
+
+
+def populated_window(
+    pm_data: PopulationModelData,
+    years: list[int],
+    shape: tuple[int, int],
+    *,
+    progress_bar: bool = False,
+) -> tuple[slice, slice]:
+    """Find the smallest window containing every populated pixel in any year.
+
+    This decodes every population raster, so building a cropped cache decodes
+    them twice: once here and once when writing the cache. That's paid once for
+    the lifetime of the cache, and lets us drop the (large) unpopulated margins of
+    the grid from it.
+    """
+    rows_populated = np.zeros(shape[0], dtype=np.bool_)
+    cols_populated = np.zeros(shape[1], dtype=np.bool_)
+    for year in tqdm.tqdm(years, disable=not progress_bar):
+        populated = pm_data.load_results(f"{year}q1")._ndarray > 0  # noqa: SLF001
+        rows_populated |= populated.any(axis=1)
+        cols_populated |= populated.any(axis=0)
+    return _bounding_slice(rows_populated), _bounding_slice(cols_populated)
+
+
+def _bounding_slice(populated: npt.NDArray[np.bool_]) -> slice:
+    if not populated.any():
+        return slice(0, populated.size)
+    start = int(np.argmax(populated))
+    stop = populated.size - int(np.argmax(populated[::-1]))
+    return slice(start, stop)
+
+
+def iter_population_slabs(
+    pm_data: PopulationModelData,
+    years: list[int],
+    rows: slice,
+    cols: slice,
+    *,
+    progress_bar: bool = False,
+) -> Iterator[npt.NDArray[np.float32]]:
+    """Yield the windowed population array for each year with NaN as no data."""
+    for year in tqdm.tqdm(years, disable=not progress_bar):
+        raster = pm_data.load_results(f"{year}q1")
+        slab = raster._ndarray[rows, cols].astype(np.float32)  # noqa: SLF001
+        no_data = raster.no_data_value
+        if no_data is not None and not np.isnan(no_data):
+            slab[slab == no_data] = np.nan
+        yield slab
+
+
+@click.command()
+@clio.with_population_cache_dir(required=True)
+@clio.with_input_directory("population-model", cac.POPULATION_MODEL_ROOT)
+@clio.with_crop()
+@clio.with_progress_bar()
+def population_cache_task(
+    population_cache_dir: str,
+    population_model_dir: str,
+    *,
+    crop: bool,
+    progress_bar: bool,
+) -> None:
+    population_cache_main(
+        population_model_dir,
+        population_cache_dir,
+        crop=crop,
+        progress_bar=progress_bar,
+    )
+
+
+@click.command()
+@clio.with_population_cache_dir(required=True)
+@clio.with_input_directory("population-model", cac.POPULATION_MODEL_ROOT)
+@clio.with_output_directory(cac.MODEL_ROOT)
+@clio.with_crop()
+@clio.with_queue()
+@clio.with_executor()
+def population_cache(
+    population_cache_dir: str,
+    population_model_dir: str,
+    output_dir: str,
+    queue: str,
+    executor: str,
+    *,
+    crop: bool,
+) -> None:
+    pm_data = PopulationModelData(population_model_dir)
+    ca_data = ClimateAggregateData(output_dir)
+
+    task_args: dict[str, str | None] = {"population-model-dir": population_model_dir}
+    if crop:
+        # Flags are passed with no value.
+        task_args["crop"] = None
+
+    cae.run_parallel(
+        executor,
+        runner="catask",
+        task_name="population_cache",
+        flat_node_args=(
+            ("population-cache-dir",),
+            [(population_cache_dir,)],
+        ),
+        task_args=task_args,
+        task_resources={
+            "queue": queue,
+            "cores": 1,
+            "memory": "20G",
+            "runtime": "600m",
+            "project": "proj_rapidresponse",
+        },
+        log_root=ca_data.log_dir("population_cache"),
+        max_attempts=3,
+    )
+
+    # The cache is built by a single task on an arbitrary node, so aggregation
+    # tasks can only use it if it's on a path every node shares.
+    if not pm_data.population_cache_is_current(population_cache_dir):
+        msg = (
+            f"Population cache not found in {population_cache_dir} after building "
+            "it. The cache directory must be a path shared by all nodes."
+        )
+        raise RuntimeError(msg)
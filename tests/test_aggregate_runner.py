@@ -0,0 +1,275 @@
+import json
+import os
+from pathlib import Path
+
+import click
+import numpy as np
+import pandas as pd
+import pytest
+
+from rra_climate_aggregates.aggregate import reducers, runner
+from rra_climate_aggregates.data import (
+    ClimateAggregateData,
+    ClimateData,
+    PopulationModelData,
+)
+
+CLIMATE_DRAW = ("ssp245", "mean_temperature", "000")
+CHECKPOINT_ARGS = ("2024_01_01.001", "gbd_2021", *CLIMATE_DRAW)
+
+
+def write_population_cache(
+    cache_dir: Path, population_model_root: Path, window: list[int]
+) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / "population.npy").touch()
+    metadata = {
+        "window": window,
+        "population_model_root": str(population_model_root.resolve()),
+    }
+    (cache_dir / "population.json").write_text(json.dumps(metadata))
+
+
+def test_align_to_population_cache_crops_mask(tmp_path: Path) -> None:
+    pm_data = PopulationModelData(tmp_path / "population-model")
+    write_population_cache(tmp_path / "cache", pm_data.root, [1, 3, 2, 5])
+    mask = np.arange(24, dtype=np.uint32).reshape(4, 6)
+
+    cache_dir, aligned = runner._align_to_population_cache(  # noqa: SLF001
+        pm_data, str(tmp_path / "cache"), mask
+    )
+
+    assert cache_dir == str(tmp_path / "cache")
+    np.testing.assert_array_equal(aligned, mask[1:3, 2:5])
+
+
+def test_align_to_population_cache_falls_back_without_cache(tmp_path: Path) -> None:
+    pm_data = PopulationModelData(tmp_path / "population-model")
+    mask = np.zeros((4, 6), dtype=np.uint32)
+
+    cache_dir, aligned = runner._align_to_population_cache(  # noqa: SLF001
+        pm_data, str(tmp_path / "missing"), mask
+    )
+
+    assert cache_dir is None
+    assert aligned is mask
+
+
+def test_align_to_population_cache_falls_back_for_other_model(tmp_path: Path) -> None:
+    pm_data = PopulationModelData(tmp_path / "population-model")
+    write_population_cache(tmp_path / "cache", tmp_path / "other-model", [0, 4, 0, 6])
+    mask = np.zeros((4, 6), dtype=np.uint32)
+
+    cache_dir, aligned = runner._align_to_population_cache(  # noqa: SLF001
+        pm_data, str(tmp_path / "cache"), mask
+    )
+
+    assert cache_dir is None
+    assert aligned is mask
+
+
+def test_aggregate_rejects_missing_population_cache(tmp_path: Path) -> None:
+    with pytest.raises(click.UsageError, match="shared by all nodes"):
+        runner.aggregate.callback(  # type: ignore[misc]
+            version=CHECKPOINT_ARGS[0],
+            scenario=[CLIMATE_DRAW[0]],
+            measure=[CLIMATE_DRAW[1]],
+            draw=[CLIMATE_DRAW[2]],
+            hierarchy=["gbd_2021"],
+            population_model_dir=str(tmp_path / "population-model"),
+            climate_data_dir=str(tmp_path / "climate-data"),
+            output_dir=str(tmp_path / "output"),
+            time_resolution="annual",
+            statistics=[],
+            histogram_bins=None,
+            population_cache_dir=str(tmp_path / "missing"),
+            compression="zstd",
+            compression_level=None,
+            queue="all.q",
+            executor="local",
+            climate_cache=False,
+            dry_run=True,
+        )
+
+
+def test_task_args_round_trip_through_task_options(tmp_path: Path) -> None:
+    bins = [0.1 + 0.2, 1234567.5]
+    for directory in ["population-model", "climate-data", "output"]:
+        (tmp_path / directory).mkdir()
+    task_args = runner._task_args(  # noqa: SLF001
+        CHECKPOINT_ARGS[0],
+        str(tmp_path / "population-model"),
+        str(tmp_path / "climate-data"),
+        str(tmp_path / "output"),
+        "annual",
+        ["climate_range", "population_histogram"],
+        bins,
+        str(tmp_path / "cache"),
+        "gzip",
+        4,
+        climate_cache=True,
+    )
+    # Per-task arguments are passed alongside, and flags with no value.
+    argv = ["--scenario", "ssp245", "--measure", "mean_temperature"]
+    argv += ["--draw", "000", "--hierarchy", "gbd_2021"]
+    for name, value in task_args.items():
+        argv += [f"--{name}"] if value is None else [f"--{name}", value]
+
+    ctx = runner.aggregate_task.make_context("aggregate", argv)
+
+    assert ctx.params["histogram_bins"] == bins
+    assert ctx.params["statistics"] == ["climate_range", "population_histogram"]
+    assert ctx.params["population_cache_dir"] == str(tmp_path / "cache")
+    assert ctx.params["compression"] == "gzip"
+    assert ctx.params["compression_level"] == 4  # noqa: PLR2004
+    assert ctx.params["climate_cache"]
+
+
+def write_climate_cache(ca_data: ClimateAggregateData, cd_data: ClimateData) -> Path:
+    source = cd_data.annual_results_path(*CLIMATE_DRAW)
+    source.parent.mkdir(parents=True)
+    source.touch()
+    metadata = {
+        "years": [2020],
+        "shape": [2, 3],
+        "dtype": "float32",
+        "source": str(source.resolve()),
+        "source_mtime_ns": source.stat().st_mtime_ns,
+    }
+    ca_data.save_climate_cache(iter([np.zeros((2, 3))]), metadata, *CLIMATE_DRAW)
+    return source
+
+
+def test_climate_cache_is_current(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path / "output")
+    cd_data = ClimateData(tmp_path / "climate-data")
+    write_climate_cache(ca_data, cd_data)
+
+    assert runner._climate_cache_is_current(ca_data, cd_data, *CLIMATE_DRAW)  # noqa: SLF001
+
+
+def test_climate_cache_is_stale_after_source_changes(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path / "output")
+    cd_data = ClimateData(tmp_path / "climate-data")
+    source = write_climate_cache(ca_data, cd_data)
+    mtime_ns = source.stat().st_mtime_ns + 10**9
+    os.utime(source, ns=(mtime_ns, mtime_ns))
+
+    assert not runner._climate_cache_is_current(ca_data, cd_data, *CLIMATE_DRAW)  # noqa: SLF001
+
+
+def test_climate_cache_is_stale_for_other_climate_data(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path / "output")
+    write_climate_cache(ca_data, ClimateData(tmp_path / "climate-data"))
+    other = ClimateData(tmp_path / "other-climate-data")
+    write_climate_cache(ClimateAggregateData(tmp_path / "other-output"), other)
+
+    assert not runner._climate_cache_is_current(ca_data, other, *CLIMATE_DRAW)  # noqa: SLF001
+
+
+def test_climate_cache_is_missing(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path / "output")
+    cd_data = ClimateData(tmp_path / "climate-data")
+
+    assert not runner._climate_cache_is_current(ca_data, cd_data, *CLIMATE_DRAW)  # noqa: SLF001
+
+
+def year_outputs(year: int) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    results = pd.DataFrame({"location_id": [1, 2], "year_id": year, "value": 1.0})
+    stats = pd.DataFrame({"location_id": [1, 2], "year_id": year, "min": 0.0})
+    return results, {"climate_range": stats}
+
+
+def test_checkpoint_resumes_from_completed_years(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path)
+    stat_reducers = [reducers.ClimateRange()]
+    result_frames, stat_frames = runner._load_checkpoint(  # noqa: SLF001
+        ca_data, stat_reducers, CHECKPOINT_ARGS
+    )
+    assert result_frames == []
+    assert stat_frames == {"climate_range": []}
+    for years in [(1950, 1951), (1952, 1953)]:
+        outputs = [year_outputs(year) for year in years]
+        runner._save_checkpoint(  # noqa: SLF001
+            ca_data, outputs, result_frames, stat_frames, CHECKPOINT_ARGS
+        )
+    # A failure between writing the statistics and results of a part leaves
+    # statistics for years that aren't done.
+    _, orphan_stats = year_outputs(1954)
+    ca_data.save_checkpoint(
+        orphan_stats["climate_range"], "climate_range", *CHECKPOINT_ARGS
+    )
+
+    results, stats = runner._load_checkpoint(  # noqa: SLF001
+        ca_data, stat_reducers, CHECKPOINT_ARGS
+    )
+
+    assert sorted(pd.concat(results).year_id.unique()) == [1950, 1951, 1952, 1953]
+    assert sorted(pd.concat(stats["climate_range"]).year_id.unique()) == [
+        1950,
+        1951,
+        1952,
+        1953,
+    ]
+
+    ca_data.clear_checkpoint(*CHECKPOINT_ARGS)
+    assert ca_data.load_checkpoint("results", *CHECKPOINT_ARGS) == []
+
+
+def test_checkpoint_part_redone_replaces_partial_part(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path)
+    partial, _ = year_outputs(1950)
+    ca_data.save_checkpoint(partial.iloc[:1], "results", *CHECKPOINT_ARGS)
+    ca_data.save_checkpoint(partial, "results", *CHECKPOINT_ARGS)
+
+    parts = ca_data.load_checkpoint("results", *CHECKPOINT_ARGS)
+
+    assert len(parts) == 1
+    pd.testing.assert_frame_equal(parts[0], partial)
+
+
+def save_checkpoint_years(
+    ca_data: ClimateAggregateData, stat_reducers: list[reducers.Reducer]
+) -> None:
+    result_frames, stat_frames = runner._load_checkpoint(  # noqa: SLF001
+        ca_data, stat_reducers, CHECKPOINT_ARGS
+    )
+    outputs = []
+    for year in (1950, 1951):
+        results, stats = year_outputs(year)
+        outputs.append((results, dict.fromkeys(stat_frames, stats["climate_range"])))
+    runner._save_checkpoint(  # noqa: SLF001
+        ca_data, outputs, result_frames, stat_frames, CHECKPOINT_ARGS
+    )
+
+
+def test_checkpoint_discarded_when_statistics_change(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path)
+    save_checkpoint_years(ca_data, [reducers.ClimateRange()])
+
+    # A statistic added on resume has no checkpointed years, so none can be reused.
+    stat_reducers = [reducers.ClimateRange(), reducers.PopulationHistogram([0.0])]
+    results, stats = runner._load_checkpoint(  # noqa: SLF001
+        ca_data, stat_reducers, CHECKPOINT_ARGS
+    )
+
+    assert results == []
+    assert stats == {"climate_range": [], "population_histogram": []}
+
+
+def test_checkpoint_discarded_when_histogram_bins_change(tmp_path: Path) -> None:
+    ca_data = ClimateAggregateData(tmp_path)
+    save_checkpoint_years(ca_data, [reducers.PopulationHistogram([0.0, 10.0])])
+
+    same_bins = [reducers.PopulationHistogram([0.0, 10.0])]
+    results, _ = runner._load_checkpoint(  # noqa: SLF001
+        ca_data, same_bins, CHECKPOINT_ARGS
+    )
+    assert len(results) == 1
+
+    other_bins = [reducers.PopulationHistogram([0.0, 20.0])]
+    results, stats = runner._load_checkpoint(  # noqa: SLF001
+        ca_data, other_bins, CHECKPOINT_ARGS
+    )
+    assert results == []
+    assert stats == {"population_histogram": []}
@@ -0,0 +1,297 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pytest
+import rasterra as rt
+import xarray as xr
+from affine import Affine
+
+from rra_climate_aggregates.aggregate import reducers, utils
+
+LOCATION_IDS = [3, 7, 12]
+MISSING_FRACTION = 0.1
+
+
+def make_raster(
+    data: npt.NDArray[np.float32], x0: float, y0: float, step: float
+) -> rt.RasterArray:
+    return rt.RasterArray(
+        data=data,
+        transform=Affine(step, 0.0, x0, 0.0, -step, y0),
+        crs="EPSG:4326",
+        no_data_value=np.nan,
+    )
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(42)
+
+
+@pytest.fixture
+def population(rng: np.random.Generator) -> rt.RasterArray:
+    # A fine grid that extends past the climate grid on the east and south
+    # edges, so some pixels have no climate data.
+    data = rng.uniform(0, 100, size=(40, 60)).astype(np.float32)
+    data[rng.uniform(size=data.shape) < MISSING_FRACTION] = np.nan
+    return make_raster(data, x0=0.0, y0=4.0, step=0.1)
+
+
+@pytest.fixture
+def location_mask(
+    rng: np.random.Generator, population: rt.RasterArray
+) -> npt.NDArray[np.uint32]:
+    return rng.choice([0, *LOCATION_IDS], size=population.shape).astype(np.uint32)
+
+
+def climate_raster(data: npt.NDArray[np.float32]) -> rt.RasterArray:
+    # A coarse grid whose pixel edges never line up with fine pixel centers.
+    return make_raster(data, x0=0.0, y0=4.0, step=0.5)
+
+
+def brute_force_sums(
+    pop: npt.NDArray[Any],
+    clim: npt.NDArray[Any],
+    location_mask: npt.NDArray[np.uint32],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    weighted = np.array(
+        [
+            np.nansum((pop * clim)[location_mask == loc], dtype=np.float64)
+            for loc in LOCATION_IDS
+        ]
+    )
+    pop_sums = np.array(
+        [np.nansum(pop[location_mask == loc], dtype=np.float64) for loc in LOCATION_IDS]
+    )
+    return weighted, pop_sums
+
+
+def test_blockwise_location_sums_matches_brute_force(
+    rng: np.random.Generator,
+    population: rt.RasterArray,
+    location_mask: npt.NDArray[np.uint32],
+) -> None:
+    clim_data = rng.normal(20, 5, size=(6, 10)).astype(np.float32)
+    clim_data[1, 2] = np.nan
+    clim = climate_raster(clim_data)
+
+    clim_arr, clim_rows, clim_cols = utils.build_nearest_index(clim, population)
+    weighted, pop_sums, _ = utils.blockwise_location_sums(
+        population.to_numpy(),
+        clim_arr,
+        clim_rows,
+        clim_cols,
+        location_mask,
+        LOCATION_IDS,
+        # Small blocks so the reduction walks several of them.
+        block_bytes=7 * population.width * 4,
+    )
+
+    resampled = clim.resample_to(population, "nearest").to_numpy()
+    expected_weighted, expected_pop = brute_force_sums(
+        population.to_numpy(), resampled, location_mask
+    )
+    np.testing.assert_allclose(weighted, expected_weighted, rtol=1e-5)
+    np.testing.assert_allclose(pop_sums, expected_pop, rtol=1e-5)
+
+
+def test_blockwise_location_sums_matches_brute_force_for_stacks(
+    rng: np.random.Generator,
+    population: rt.RasterArray,
+    location_mask: npt.NDArray[np.uint32],
+) -> None:
+    stack = rng.normal(20, 5, size=(4, 6, 10)).astype(np.float32)
+    stack[2, 3, 4] = np.nan
+    clim = climate_raster(stack[0])
+
+    _, clim_rows, clim_cols = utils.build_nearest_index(clim, population)
+    padded = np.stack(
+        [
+            utils.build_nearest_index(climate_raster(step), population)[0]
+            for step in stack
+        ]
+    )
+    weighted, pop_sums, _ = utils.blockwise_location_sums(
+        population.to_numpy(),
+        padded,
+        clim_rows,
+        clim_cols,
+        location_mask,
+        LOCATION_IDS,
+        block_bytes=5 * stack.shape[0] * population.width * 4,
+    )
+
+    assert weighted.shape == (stack.shape[0], len(LOCATION_IDS))
+    for t in range(stack.shape[0]):
+        resampled = climate_raster(stack[t]).resample_to(population, "nearest")
+        expected_weighted, expected_pop = brute_force_sums(
+            population.to_numpy(), resampled.to_numpy(), location_mask
+        )
+        np.testing.assert_allclose(weighted[t], expected_weighted, rtol=1e-5)
+        np.testing.assert_allclose(pop_sums, expected_pop, rtol=1e-5)
+
+
+def test_build_nearest_index_points_outside_pixels_at_padding(
+    population: rt.RasterArray,
+) -> None:
+    clim = climate_raster(np.ones((6, 10), dtype=np.float32))
+
+    clim_arr, clim_rows, clim_cols = utils.build_nearest_index(clim, population)
+
+    assert clim_arr.shape == (7, 11)
+    assert np.isnan(clim_arr[-1]).all()
+    assert np.isnan(clim_arr[:, -1]).all()
+    # The population grid is 4 degrees tall and 6 wide, the climate grid 3 and 5.
+    np.testing.assert_array_equal(clim_rows, np.minimum(np.arange(40) // 5, 6))
+    np.testing.assert_array_equal(clim_cols, np.minimum(np.arange(60) // 5, 10))
+
+
+@pytest.mark.parametrize("dense_bincount", [True, False])
+def test_location_weights_match_brute_force(
+    rng: np.random.Generator,
+    population: rt.RasterArray,
+    location_mask: npt.NDArray[np.uint32],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    *,
+    dense_bincount: bool,
+) -> None:
+    if not dense_bincount:
+        monkeypatch.setattr(utils, "DENSE_BINCOUNT_FACTOR", 0)
+    stack = rng.normal(20, 5, size=(5, 6, 10)).astype(np.float32)
+    stack[2, 3, 4] = np.nan
+    clim = climate_raster(stack[0])
+    # Read the stack lazily, the way sub-annual climate data is.
+    path = tmp_path / "stack.nc"
+    xr.DataArray(stack, dims=("time", "latitude", "longitude")).to_netcdf(path)
+
+    _, clim_rows, clim_cols = utils.build_nearest_index(clim, population)
+    pop_sums, location_index, pixel_index, weights = utils.build_location_weights(
+        population.to_numpy(),
+        clim_rows,
+        clim_cols,
+        (clim.height, clim.width),
+        location_mask,
+        LOCATION_IDS,
+    )
+    with xr.open_dataarray(path) as lazy_stack:
+        weighted = utils.weighted_location_sums(
+            lazy_stack,
+            location_index,
+            pixel_index,
+            weights,
+            len(LOCATION_IDS),
+            # Small chunks so the reduction walks several of them.
+            chunk_bytes=2 * (stack[0].nbytes + weights.nbytes),
+        )
+
+    # Each (location, climate pixel) pair appears once.
+    pairs = location_index * stack[0].size + pixel_index
+    assert np.unique(pairs).size == pairs.size
+    assert weighted.shape == (stack.shape[0], len(LOCATION_IDS))
+    for t in range(stack.shape[0]):
+        resampled = climate_raster(stack[t]).resample_to(population, "nearest")
+        expected_weighted, expected_pop = brute_force_sums(
+            population.to_numpy(), resampled.to_numpy(), location_mask
+        )
+        np.testing.assert_allclose(weighted[t], expected_weighted, rtol=1e-5)
+        np.testing.assert_allclose(pop_sums, expected_pop, rtol=1e-5)
+
+
+def test_reducers_match_brute_force(
+    rng: np.random.Generator,
+    population: rt.RasterArray,
+    location_mask: npt.NDArray[np.uint32],
+) -> None:
+    clim_data = rng.normal(20, 5, size=(6, 10)).astype(np.float32)
+    clim_data[1, 2] = np.nan
+    clim = climate_raster(clim_data)
+    row_area = reducers.pixel_row_areas(population)
+    stat_reducers = [
+        reducers.PopulationHistogram([15.0, 25.0]),
+        reducers.AreaWeightedMean(row_area),
+        reducers.ClimateRange(),
+    ]
+    # A location with no pixels at all.
+    location_ids = [*LOCATION_IDS, 99]
+
+    clim_arr, clim_rows, clim_cols = utils.build_nearest_index(clim, population)
+    utils.blockwise_location_sums(
+        population.to_numpy(),
+        clim_arr,
+        clim_rows,
+        clim_cols,
+        location_mask,
+        location_ids,
+        stat_reducers,
+        block_bytes=7 * population.width * 4,
+    )
+    columns = {
+        column: values[0]
+        for reducer in stat_reducers
+        for column, values in reducer.columns(time_steps=1).items()
+    }
+
+    resampled = np.asarray(
+        clim.resample_to(population, "nearest").to_numpy(), dtype=np.float32
+    )
+    pop = np.nan_to_num(population.to_numpy())
+    area = np.broadcast_to(row_area[:, None], pop.shape)
+    bins = np.digitize(resampled, [15.0, 25.0])
+    for i, loc in enumerate(LOCATION_IDS):
+        in_location = (location_mask == loc) & ~np.isnan(resampled)
+        values = resampled[in_location]
+        for b, column in enumerate(stat_reducers[0].aggregations):
+            expected = pop[in_location & (bins == b)].sum()
+            np.testing.assert_allclose(columns[column][i], expected, rtol=1e-5)
+        np.testing.assert_allclose(
+            columns["weighted_climate"][i],
+            (area[in_location] * values).sum(),
+            rtol=1e-5,
+        )
+        np.testing.assert_allclose(columns["area"][i], area[in_location].sum())
+        assert columns["min"][i] == values.min()
+        assert columns["max"][i] == values.max()
+
+    assert columns["area"][-1] == 0
+    assert np.isnan(columns["min"][-1])
+    assert np.isnan(columns["max"][-1])
+
+
+def test_aggregate_statistics_to_hierarchy() -> None:
+    # Global (1) has a region (2) with two countries (3, 4), and a country (5)
+    # that is directly under global.
+    hierarchy = pd.DataFrame(
+        {
+            "location_id": [1, 2, 3, 4, 5],
+            "parent_id": [1, 1, 2, 2, 1],
+            "level": [0, 1, 2, 2, 1],
+        }
+    )
+    data = pd.DataFrame(
+        {
+            "location_id": [3, 4, 5],
+            "year_id": 2000,
+            "scenario": "ssp245",
+            "area": [1.0, 2.0, 4.0],
+            "min": [5.0, 3.0, 7.0],
+        }
+    )
+
+    result = utils.aggregate_statistics_to_hierarchy(
+        data, hierarchy, {"area": "sum", "min": "min"}
+    )
+
+    expected = pd.DataFrame(
+        {
+            "location_id": [1, 2, 3, 4, 5],
+            "year_id": 2000,
+            "scenario": "ssp245",
+            "area": [7.0, 3.0, 1.0, 2.0, 4.0],
+            "min": [3.0, 3.0, 5.0, 3.0, 7.0],
+        }
+    )
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,79 @@
+import subprocess
+import sys
+
+import pytest
+
+from rra_climate_aggregates import cli
+
+# Modules that should only be imported once a stage command is invoked.
+HEAVY_MODULES = [
+    "geopandas",
+    "numpy",
+    "pandas",
+    "rasterio",
+    "rasterra",
+    "rioxarray",
+    "rra_tools.jobmon",
+    "shapely",
+    "xarray",
+]
+
+
+def imported_modules(code: str) -> list[str]:
+    """Run code in a fresh interpreter and list the modules it imported."""
+    code = f"import sys; {code}; print('\\n'.join(sys.modules))"
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout.splitlines()
+
+
+def is_imported(module: str, imported: list[str]) -> bool:
+    return any(name == module or name.startswith(f"{module}.") for name in imported)
+
+
+@pytest.mark.parametrize("entry_point", ["carun", "catask"])
+def test_entry_points_do_not_import_heavy_modules(entry_point: str) -> None:
+    # Every task starts a fresh catask process, so anything imported before its
+    # arguments are parsed is paid once per task.
+    imported = imported_modules(
+        f"from rra_climate_aggregates.cli import {entry_point}; "
+        f"{entry_point}.list_commands(None)"
+    )
+
+    heavy = [module for module in HEAVY_MODULES if is_imported(module, imported)]
+    assert heavy == []
+
+
+@pytest.mark.parametrize("entry_point", ["carun", "catask"])
+@pytest.mark.parametrize("stage", sorted(cli.STAGES))
+def test_stage_commands_do_not_import_jobmon(entry_point: str, stage: str) -> None:
+    # Jobmon is only needed once a launcher submits a workflow to it.
+    imported = imported_modules(
+        f"from rra_climate_aggregates.cli import {entry_point}; "
+        f"{entry_point}.get_command(None, {stage!r})"
+    )
+
+    assert not is_imported("rra_tools.jobmon", imported)
+
+
+def test_aggregate_task_does_not_import_launcher_modules() -> None:
+    imported = imported_modules(
+        "from rra_climate_aggregates.cli import catask; "
+        "catask.get_command(None, 'aggregate')"
+    )
+
+    launcher_modules = [
+        "rra_climate_aggregates.aggregate.planner",
+        "rra_climate_aggregates.executor",
+    ]
+    assert [
+        module for module in launcher_modules if is_imported(module, imported)
+    ] == []
+
+
+@pytest.mark.parametrize("group", [cli.carun, cli.catask])
+def test_every_stage_provides_its_command(group: cli.LazyGroup) -> None:
+    assert group.list_commands(None) == sorted(cli.STAGES)  # type: ignore[arg-type]
+    for name in cli.STAGES:
+        assert group.get_command(None, name) is not None  # type: ignore[arg-type]
@@ -0,0 +1,153 @@
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from rra_climate_aggregates import executor as cae
+from rra_climate_aggregates.climate_cache import runner
+from rra_climate_aggregates.data import ClimateAggregateData, ClimateData
+
+CLIMATE_DRAW = ("ssp245", "mean_temperature", "000")
+TRANSFORM = [0.5, 0.0, -180.0, 0.0, -0.5, 90.0]
+
+
+def test_int16_scale_offset_spans_the_data_range() -> None:
+    ds = xr.Dataset({"value": ("x", np.array([-10.0, np.nan, 30.0]))})
+
+    scale, offset = runner.int16_scale_offset(ds)
+
+    assert offset == 10.0  # noqa: PLR2004
+    assert (-10.0 - offset) / scale == -runner.INT16_MAX
+    assert (30.0 - offset) / scale == runner.INT16_MAX
+
+
+def test_int16_scale_offset_of_constant_data() -> None:
+    ds = xr.Dataset({"value": ("x", np.array([5.0, 5.0]))})
+
+    assert runner.int16_scale_offset(ds) == (1.0, 5.0)
+
+
+def test_encode_int16() -> None:
+    data = np.array([-1.0, 0.0, 0.26, np.nan, 100.0])
+
+    encoded = runner.encode_int16(data, scale=0.5, offset=0.0)
+
+    assert encoded.dtype == np.int16
+    # Values are rounded, NaNs get the missing value, and out of range values
+    # are clipped rather than wrapping around.
+    np.testing.assert_array_equal(encoded[:3], [-2, 0, 1])
+    assert encoded[3] == runner.INT16_MISSING
+    assert encoded[4] == 200  # noqa: PLR2004
+    assert runner.encode_int16(np.array([1e9]), 1.0, 0.0)[0] == runner.INT16_MAX
+
+
+def cache_metadata(dtype: str) -> dict[str, Any]:
+    return {
+        "years": [2020, 2021],
+        "shape": [2, 3],
+        "dtype": dtype,
+        "transform": TRANSFORM,
+        "crs": "EPSG:4326",
+    }
+
+
+@pytest.fixture
+def years() -> list[np.ndarray[Any, np.dtype[np.float64]]]:
+    first = np.array([[1.0, 2.0, np.nan], [4.0, 5.0, 6.0]])
+    return [first, first * 2]
+
+
+def test_float32_climate_cache_round_trip(
+    tmp_path: Path, years: list[np.ndarray[Any, np.dtype[np.float64]]]
+) -> None:
+    ca_data = ClimateAggregateData(tmp_path)
+    slabs = (year.astype(np.float32) for year in years)
+    ca_data.save_climate_cache(slabs, cache_metadata("float32"), *CLIMATE_DRAW)
+
+    loaded = ca_data.load_climate_cache(*CLIMATE_DRAW, year=2021)
+
+    np.testing.assert_array_equal(loaded.to_numpy(), years[1])
+    assert list(loaded.transform)[:6] == TRANSFORM
+    assert (
+        not ca_data.climate_cache_path(*CLIMATE_DRAW).with_suffix(".npy.tmp").exists()
+    )
+
+
+def test_int16_climate_cache_round_trip(
+    tmp_path: Path, years: list[np.ndarray[Any, np.dtype[np.float64]]]
+) -> None:
+    ca_data = ClimateAggregateData(tmp_path)
+    ds = xr.Dataset({"value": (("year", "y", "x"), np.stack(years))})
+    scale, offset = runner.int16_scale_offset(ds)
+    metadata = cache_metadata("int16") | {"scale": scale, "offset": offset}
+    slabs = (runner.encode_int16(year, scale, offset) for year in years)
+    ca_data.save_climate_cache(slabs, metadata, *CLIMATE_DRAW)
+
+    for year, expected in zip([2020, 2021], years, strict=True):
+        raster = ca_data.load_climate_cache(*CLIMATE_DRAW, year=year)
+        assert raster.to_numpy().dtype == np.float32
+        loaded = np.asarray(raster.to_numpy(), dtype=np.float32)
+        np.testing.assert_allclose(loaded, expected, atol=scale / 2 + 1e-5)
+        np.testing.assert_array_equal(np.isnan(loaded), np.isnan(expected))
+
+
+def launched_jobs(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, encoding: str
+) -> list[tuple[str, str, str]]:
+    jobs = []
+
+    def run_parallel(*_args: Any, **kwargs: Any) -> None:
+        jobs.extend(kwargs["flat_node_args"][1])
+
+    monkeypatch.setattr(cae, "run_parallel", run_parallel)
+    runner.climate_cache.callback(  # type: ignore[misc]
+        scenario=[CLIMATE_DRAW[0]],
+        measure=[CLIMATE_DRAW[1]],
+        draw=[CLIMATE_DRAW[2]],
+        climate_data_dir=str(tmp_path / "climate-data"),
+        output_dir=str(tmp_path / "output"),
+        encoding=encoding,
+        queue="all.q",
+        executor="local",
+    )
+    return jobs
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    ca_data = ClimateAggregateData(tmp_path / "output")
+    cd_data = ClimateData(tmp_path / "climate-data")
+    source = cd_data.annual_results_path(*CLIMATE_DRAW)
+    source.parent.mkdir(parents=True)
+    source.touch()
+    metadata = cache_metadata("float32") | {
+        "source": str(source.resolve()),
+        "source_mtime_ns": source.stat().st_mtime_ns,
+    }
+    slabs = iter([np.zeros((2, 3)), np.zeros((2, 3))])
+    ca_data.save_climate_cache(slabs, metadata, *CLIMATE_DRAW)
+    return source
+
+
+def test_climate_cache_launcher_skips_current_caches(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source: Path
+) -> None:
+    assert launched_jobs(monkeypatch, tmp_path, "float32") == []
+
+
+def test_climate_cache_launcher_rebuilds_other_encodings(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source: Path
+) -> None:
+    assert launched_jobs(monkeypatch, tmp_path, "int16") == [CLIMATE_DRAW]
+
+
+def test_climate_cache_launcher_rebuilds_stale_caches(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source: Path
+) -> None:
+    mtime_ns = source.stat().st_mtime_ns + 10**9
+    os.utime(source, ns=(mtime_ns, mtime_ns))
+
+    assert launched_jobs(monkeypatch, tmp_path, "float32") == [CLIMATE_DRAW]
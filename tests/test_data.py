@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from rra_climate_aggregates.data import ClimateAggregateData
+
+VERSION = "2024_01_01.001"
+JOB = ("gbd_2021", "ssp245", "mean_temperature", "000")
+
+
+@pytest.fixture
+def ca_data(tmp_path: Path) -> ClimateAggregateData:
+    return ClimateAggregateData(tmp_path)
+
+
+@pytest.fixture
+def raw_results() -> pd.DataFrame:
+    # Unsorted, with a non-trivial index, in the types the pipeline produces.
+    return pd.DataFrame(
+        {
+            "location_id": [102, 6, 102, 6],
+            "year_id": [1951, 1951, 1950, 1950],
+            "scenario": "ssp245",
+            "value": [10.25, 20.5, 11.0, 21.75],
+        },
+        index=[7, 3, 5, 1],
+    )
+
+
+def test_raw_results_round_trip(
+    ca_data: ClimateAggregateData, raw_results: pd.DataFrame
+) -> None:
+    ca_data.save_raw_results(raw_results, VERSION, *JOB)
+    loaded = ca_data.load_raw_results(VERSION, *JOB)
+
+    assert loaded.dtypes.astype(str).to_dict() == {
+        "location_id": "int32",
+        "year_id": "int16",
+        "scenario": "category",
+        "value": "float32",
+    }
+    expected = raw_results.sort_values(["location_id", "year_id"]).reset_index(
+        drop=True
+    )
+    pd.testing.assert_frame_equal(
+        loaded.astype({"scenario": str}), expected, check_dtype=False
+    )
+
+
+def test_population_round_trip_keeps_float64_values(
+    ca_data: ClimateAggregateData,
+) -> None:
+    population = pd.DataFrame(
+        {
+            "location_id": [1, 1, 2],
+            "year_id": [1950, 1951, 1950],
+            "value": [7.9e9 + 0.5, 8.0e9 + 0.25, 1.0],
+        }
+    )
+    ca_data.save_population(population, VERSION, "gbd_2021")
+
+    loaded = ca_data.load_population(VERSION, "gbd_2021", location_id=1)
+
+    assert loaded.value.dtype == np.float64
+    pd.testing.assert_frame_equal(
+        loaded, population.iloc[:2].reset_index(drop=True), check_dtype=False
+    )
+
+
+def test_legacy_raw_results_keep_stored_types_until_migrated(
+    ca_data: ClimateAggregateData, raw_results: pd.DataFrame
+) -> None:
+    path = ca_data.raw_results_path(VERSION, *JOB)
+    path.parent.mkdir(parents=True)
+    raw_results.to_parquet(path)
+
+    loaded = ca_data.load_raw_results(VERSION, *JOB)
+
+    pd.testing.assert_frame_equal(loaded, raw_results.reset_index(drop=True))
+
+    assert ca_data.migrate_raw_results(VERSION) == 1
+    assert ca_data.migrate_raw_results(VERSION) == 0
+    migrated = ca_data.load_raw_results(VERSION, *JOB)
+    assert migrated.location_id.dtype == np.int32
+    assert migrated.value.dtype == np.float32
+
+
+def test_compression_level_defaults_to_the_codec_default(tmp_path: Path) -> None:
+    assert ClimateAggregateData(tmp_path)._compression_level == 9  # noqa: SLF001, PLR2004
+    gzip = ClimateAggregateData(tmp_path, compression="gzip")
+    assert gzip._compression_level is None  # noqa: SLF001
+    with pytest.raises(ValueError, match="compression level"):
+        ClimateAggregateData(tmp_path, compression="snappy", compression_level=3)
+
+
+@pytest.mark.parametrize(("compression", "level"), [("gzip", 4), ("none", None)])
+def test_raw_results_compression(
+    tmp_path: Path, raw_results: pd.DataFrame, compression: str, level: int | None
+) -> None:
+    ca_data = ClimateAggregateData(tmp_path, compression, level)
+    ca_data.save_raw_results(raw_results, VERSION, *JOB)
+
+    metadata = pq.ParquetFile(ca_data.raw_results_path(VERSION, *JOB)).metadata
+    codec = metadata.row_group(0).column(0).compression
+    assert codec == compression.upper().replace("NONE", "UNCOMPRESSED")
+    assert len(ca_data.load_raw_results(VERSION, *JOB)) == len(raw_results)
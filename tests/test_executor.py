@@ -0,0 +1,173 @@
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from rra_climate_aggregates import executor as cae
+
+
+def python_task(code: str, name: str, cores: int, memory: int) -> cae.LocalTask:
+    return [sys.executable, "-c", code], name, cores, memory
+
+
+def test_run_packed_runs_mixed_size_tasks_in_a_shared_budget(tmp_path: Path) -> None:
+    tasks = [
+        python_task("pass", "small_1", cores=1, memory=2**30),
+        python_task("pass", "large", cores=4, memory=8 * 2**30),
+        python_task("pass", "small_2", cores=1, memory=2**30),
+        # Bigger than the whole machine, so it runs on its own.
+        python_task("pass", "huge", cores=8, memory=64 * 2**30),
+    ]
+
+    failed = cae._run_packed(  # noqa: SLF001
+        tasks,
+        available_cores=4,
+        available_memory=16 * 2**30,
+        log_root=tmp_path,
+        max_attempts=1,
+    )
+
+    assert failed == []
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "huge.1.log",
+        "large.1.log",
+        "small_1.1.log",
+        "small_2.1.log",
+    ]
+
+
+def timed_task(tmp_path: Path, name: str, cores: int, memory: int) -> cae.LocalTask:
+    """A task that records when it started and finished running."""
+    times_path = tmp_path / f"{name}.times"
+    code = (
+        "import pathlib, time; "
+        "start = time.time(); "
+        "time.sleep(0.2); "
+        f"pathlib.Path({str(times_path)!r}).write_text(f'{{start}} {{time.time()}}')"
+    )
+    return python_task(code, name, cores, memory)
+
+
+def test_run_packed_stays_within_budget(tmp_path: Path) -> None:
+    available_cores, available_memory = 4, 8 * 2**30
+    tasks = [
+        timed_task(tmp_path, "large", cores=3, memory=4 * 2**30),
+        timed_task(tmp_path, "medium", cores=2, memory=6 * 2**30),
+        timed_task(tmp_path, "huge", cores=8, memory=32 * 2**30),
+        *[timed_task(tmp_path, f"small_{i}", cores=1, memory=2**30) for i in range(4)],
+    ]
+
+    failed = cae._run_packed(  # noqa: SLF001
+        tasks, available_cores, available_memory, tmp_path, max_attempts=1
+    )
+
+    assert failed == []
+    spans = {}
+    for _, name, cores, memory in tasks:
+        start, end = map(float, (tmp_path / f"{name}.times").read_text().split())
+        spans[name] = (start, end, cores, memory)
+    concurrency = []
+    for start, *_ in spans.values():
+        running = [name for name, (s, e, *_) in spans.items() if s <= start < e]
+        concurrency.append(running)
+        if "huge" in running:
+            assert running == ["huge"]
+            continue
+        assert sum(spans[name][2] for name in running) <= available_cores
+        assert sum(spans[name][3] for name in running) <= available_memory
+    # Small tasks are packed in around the larger ones.
+    assert max(len(running) for running in concurrency) > 1
+
+
+def test_run_local_builds_task_commands(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    packed: list[cae.LocalTask] = []
+
+    def run_packed(tasks: list[cae.LocalTask], *_args: Any) -> list[str]:
+        packed.extend(tasks)
+        return []
+
+    monkeypatch.setattr(cae, "_run_packed", run_packed)
+    monkeypatch.setattr(cae, "available_resources", lambda: (4, 16 * 2**30))
+
+    cae.run_local(
+        runner="catask",
+        task_name="aggregate",
+        flat_node_args=(("scenario", "draw"), [("ssp245", "000"), ("ssp585", "001")]),
+        task_args={"output-dir": "/output", "climate-cache": None},
+        task_resources={"queue": "all.q", "cores": 1, "memory": "10G"},
+        log_root=tmp_path,
+        per_task_resources=lambda values: (
+            {"memory": "30G"} if values[0] == "ssp585" else {}
+        ),
+    )
+
+    common = ["--output-dir", "/output", "--climate-cache"]
+    assert packed == [
+        (
+            ["catask", "aggregate", "--scenario", "ssp245", "--draw", "000", *common],
+            "aggregate_ssp245_000",
+            1,
+            10 * 2**30,
+        ),
+        (
+            ["catask", "aggregate", "--scenario", "ssp585", "--draw", "001", *common],
+            "aggregate_ssp585_001",
+            1,
+            30 * 2**30,
+        ),
+    ]
+
+
+def test_run_local_raises_if_tasks_fail(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(cae, "_run_packed", lambda *_args: ["aggregate_ssp245"])
+    monkeypatch.setattr(cae, "available_resources", lambda: (4, 16 * 2**30))
+
+    with pytest.raises(RuntimeError, match="1 of 1 tasks failed"):
+        cae.run_local(
+            runner="catask",
+            task_name="aggregate",
+            flat_node_args=(("scenario",), [("ssp245",)]),
+            task_args={},
+            task_resources={},
+            log_root=tmp_path,
+        )
+
+
+def test_run_packed_retries_and_reports_failed_tasks(tmp_path: Path) -> None:
+    tasks = [
+        python_task("pass", "ok", cores=1, memory=2**30),
+        python_task("raise SystemExit(1)", "bad", cores=1, memory=2**30),
+    ]
+
+    failed = cae._run_packed(  # noqa: SLF001
+        tasks,
+        available_cores=2,
+        available_memory=2 * 2**30,
+        log_root=tmp_path,
+        max_attempts=2,
+    )
+
+    assert failed == ["bad"]
+    assert (tmp_path / "bad.2.log").exists()
+
+
+@pytest.mark.parametrize(
+    ("memory", "expected"),
+    [("30G", 30 * 2**30), ("512M", 512 * 2**20), ("1.5T", int(1.5 * 2**40))],
+)
+def test_parse_memory(memory: str, expected: int) -> None:
+    assert cae.parse_memory(memory) == expected
+
+
+def test_task_cores_memory_defaults() -> None:
+    assert cae.task_cores_memory({"memory": "10G"}) == (1, 10 * 2**30)
+
+
+def test_log_name_replaces_path_separators() -> None:
+    name = cae.log_name("population_cache", ["/mnt/scratch/population cache"])
+    assert name == "population_cache__mnt_scratch_population_cache"
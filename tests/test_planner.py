@@ -0,0 +1,111 @@
+import pandas as pd
+import pytest
+
+from rra_climate_aggregates.aggregate import planner, utils
+
+JOB = ("ssp245", "mean_temperature", "000", "gbd_2021")
+BASE = utils.telemetry_configuration((), population_cache=False, climate_cache=False)
+CACHED = utils.telemetry_configuration(
+    ["climate_range"], population_cache=True, climate_cache=True
+)
+
+
+@pytest.fixture
+def features() -> pd.DataFrame:
+    features = pd.DataFrame([JOB], columns=planner.JOB_COLUMNS)
+    features["pixels"] = 10**9
+    features["bbox_pixels"] = 10**8
+    features["netcdf_bytes"] = 10**9
+    features["netcdf_files"] = 1
+    features["years"] = 150
+    features["time_steps"] = 1
+    return features
+
+
+def telemetry_record(
+    features: pd.DataFrame,
+    configuration: dict[str, str | bool],
+    memory_ratio: float,
+    runtime_ratio: float,
+) -> pd.DataFrame:
+    """Telemetry of a task that used a multiple of the predicted resources."""
+    record = features.copy()
+    for column, value in configuration.items():
+        record[column] = value
+    record["peak_memory_bytes"] = planner.predict_memory(features) * memory_ratio
+    record["runtime_seconds"] = planner.predict_runtime(features) * runtime_ratio
+    return record
+
+
+def test_calibration_factors_without_telemetry() -> None:
+    assert planner.calibration_factors(pd.DataFrame()) == (1.0, 1.0)
+
+
+def test_calibration_factors_cover_nearly_all_tasks(features: pd.DataFrame) -> None:
+    telemetry = pd.concat(
+        [telemetry_record(features, BASE, ratio, 2 * ratio) for ratio in range(1, 22)]
+    )
+
+    memory_factor, runtime_factor = planner.calibration_factors(telemetry)
+
+    assert memory_factor == pytest.approx(20.0)
+    assert runtime_factor == pytest.approx(40.0)
+
+
+def test_plan_resources_rounds_up_to_resource_steps(features: pd.DataFrame) -> None:
+    plan = planner.plan_resources(features, pd.DataFrame(), BASE)
+
+    memory_gb = planner.predict_memory(features)[0] * planner.SAFETY_MARGIN / 2**30
+    runtime_minutes = planner.predict_runtime(features)[0] * planner.SAFETY_MARGIN / 60
+    row = plan.iloc[0]
+    assert tuple(row[planner.JOB_COLUMNS]) == JOB
+    assert row.cores == 1
+    assert row.memory_gb % planner.MEMORY_STEP_GB == 0
+    assert memory_gb <= row.memory_gb < memory_gb + planner.MEMORY_STEP_GB
+    assert row.runtime_minutes % planner.RUNTIME_STEP_MINUTES == 0
+    assert (
+        runtime_minutes
+        <= row.runtime_minutes
+        < runtime_minutes + planner.RUNTIME_STEP_MINUTES
+    )
+
+
+def test_plan_resources_calibrates_per_configuration(features: pd.DataFrame) -> None:
+    telemetry = pd.concat(
+        [
+            telemetry_record(features, BASE, 1.0, 1.0),
+            telemetry_record(features, CACHED, 4.0, 4.0),
+        ]
+    )
+    uncalibrated = planner.plan_resources(features, pd.DataFrame(), BASE)
+
+    base = planner.plan_resources(features, telemetry, BASE)
+    cached = planner.plan_resources(features, telemetry, CACHED)
+
+    pd.testing.assert_frame_equal(base, uncalibrated)
+    assert cached.memory_gb[0] > base.memory_gb[0]
+    assert cached.runtime_minutes[0] > base.runtime_minutes[0]
+
+
+def test_matching_telemetry_falls_back_to_all_telemetry(
+    features: pd.DataFrame,
+) -> None:
+    telemetry = telemetry_record(features, BASE, 1.0, 1.0)
+    other = utils.telemetry_configuration(
+        ["population_histogram"], population_cache=False, climate_cache=False
+    )
+
+    assert planner.matching_telemetry(telemetry, other) is telemetry
+    # Telemetry recorded before configurations were.
+    legacy = telemetry.drop(columns=list(BASE))
+    assert planner.matching_telemetry(legacy, BASE) is legacy
+
+
+def test_job_resources(features: pd.DataFrame) -> None:
+    plan = features[planner.JOB_COLUMNS].assign(
+        cores=1, memory_gb=15, runtime_minutes=90
+    )
+
+    assert planner.job_resources(plan) == {
+        JOB: {"cores": 1, "memory": "15G", "runtime": "90m"}
+    }
@@ -0,0 +1,148 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+import rasterio
+from affine import Affine
+
+from rra_climate_aggregates import constants as cac
+from rra_climate_aggregates import executor as cae
+from rra_climate_aggregates.data import PopulationModelData
+from rra_climate_aggregates.population_cache import runner
+
+YEARS = [2020, 2021]
+TRANSFORM = Affine(0.01, 0.0, 10.0, 0.0, -0.01, 50.0)
+NO_DATA = -9999.0
+
+
+def write_population(path: Path, data: npt.NDArray[np.float32]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[0],
+        width=data.shape[1],
+        count=1,
+        dtype="float32",
+        crs="EPSG:4326",
+        transform=TRANSFORM,
+        nodata=NO_DATA,
+    ) as dst:
+        dst.write(data, 1)
+
+
+@pytest.fixture
+def pm_data(tmp_path: Path) -> PopulationModelData:
+    # Each year is populated in a different corner of the same unpopulated
+    # margin, with a no-data pixel inside the populated extent.
+    pm_data = PopulationModelData(tmp_path / "population-model")
+    first = np.zeros((6, 8), dtype=np.float32)
+    first[1, 2] = 5.0
+    first[2, 3] = NO_DATA
+    second = np.zeros((6, 8), dtype=np.float32)
+    second[3, 5] = 7.0
+    for year, data in zip(YEARS, [first, second], strict=True):
+        write_population(pm_data.results_path(f"{year}q1"), data)
+    return pm_data
+
+
+@pytest.fixture
+def years(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    monkeypatch.setattr(cac, "YEARS", YEARS)
+    return YEARS
+
+
+def test_populated_window_covers_every_year(pm_data: PopulationModelData) -> None:
+    rows, cols = runner.populated_window(pm_data, YEARS, (6, 8))
+
+    assert (rows, cols) == (slice(1, 4), slice(2, 6))
+
+
+def test_bounding_slice_of_unpopulated_axis_is_the_full_axis() -> None:
+    populated = np.zeros(4, dtype=np.bool_)
+
+    assert runner._bounding_slice(populated) == slice(0, 4)  # noqa: SLF001
+
+
+@pytest.mark.parametrize("crop", [False, True])
+def test_population_cache_round_trip(
+    tmp_path: Path, pm_data: PopulationModelData, years: list[int], *, crop: bool
+) -> None:
+    cache_dir = tmp_path / "cache"
+    runner.population_cache_main(str(pm_data.root), str(cache_dir), crop=crop)
+
+    rows, cols = pm_data.population_cache_window(cache_dir)
+    expected_window = (slice(1, 4), slice(2, 6)) if crop else (slice(0, 6), slice(0, 8))
+    assert (rows, cols) == expected_window
+    assert pm_data.population_cache_is_current(cache_dir)
+    for year in years:
+        cached = pm_data.load_population_cache(cache_dir, year)
+        raster = pm_data.load_results(f"{year}q1")
+        expected = raster.to_numpy()[rows, cols].astype(np.float32)
+        expected[expected == NO_DATA] = np.nan
+
+        assert cached.to_numpy().dtype == np.float32
+        np.testing.assert_array_equal(cached.to_numpy(), expected)
+        assert cached.transform == TRANSFORM * TRANSFORM.translation(
+            cols.start, rows.start
+        )
+    assert np.isnan(pm_data.load_population_cache(cache_dir, 2020).to_numpy()).any()
+
+
+def test_population_cache_from_other_model_is_not_current(
+    tmp_path: Path, pm_data: PopulationModelData, years: list[int]
+) -> None:
+    cache_dir = tmp_path / "cache"
+    runner.population_cache_main(str(pm_data.root), str(cache_dir))
+    other = PopulationModelData(tmp_path / "other-population-model")
+
+    assert not other.population_cache_is_current(cache_dir)
+    assert not pm_data.population_cache_is_current(tmp_path / "missing")
+
+
+def launch(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    pm_data: PopulationModelData,
+    *,
+    build: bool,
+) -> None:
+    def run_parallel(*_args: Any, **kwargs: Any) -> None:
+        # Tasks on other nodes only leave a cache behind on shared paths.
+        if build:
+            for (cache_dir,) in kwargs["flat_node_args"][1]:
+                runner.population_cache_main(str(pm_data.root), cache_dir)
+
+    monkeypatch.setattr(cae, "run_parallel", run_parallel)
+    runner.population_cache.callback(  # type: ignore[misc]
+        population_cache_dir=str(tmp_path / "cache"),
+        population_model_dir=str(pm_data.root),
+        output_dir=str(tmp_path / "output"),
+        queue="all.q",
+        executor="local",
+        crop=False,
+    )
+
+
+def test_population_cache_launcher_finds_shared_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    pm_data: PopulationModelData,
+    years: list[int],
+) -> None:
+    launch(monkeypatch, tmp_path, pm_data, build=True)
+
+    assert pm_data.population_cache_is_current(tmp_path / "cache")
+
+
+def test_population_cache_launcher_rejects_unshared_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    pm_data: PopulationModelData,
+    years: list[int],
+) -> None:
+    with pytest.raises(RuntimeError, match="shared by all nodes"):
+        launch(monkeypatch, tmp_path, pm_data, build=False)
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rra_climate_aggregates.aggregate import reducers
+
+BIN_EDGES = [10.0, 20.0]
+QUANTILE_COLUMNS = ["p05", "p25", "p50", "p75", "p95"]
+
+
+@pytest.fixture
+def histogram() -> reducers.PopulationHistogram:
+    return reducers.PopulationHistogram(BIN_EDGES)
+
+
+def test_population_histogram_accumulates_population_by_bin(
+    histogram: reducers.PopulationHistogram,
+) -> None:
+    # Slot 0 of each time step collects pixels outside any location, slots 1
+    # and 2 are locations.
+    locations = np.array([[0, 1], [1, 2]], dtype=np.int32)
+    slots = locations + 3 * np.arange(2, dtype=np.int32)[:, None, None]
+    clim = np.array([[[5, 5], [15, 25]], [[25, np.nan], [5, 15]]], dtype=np.float32)
+    pop = np.array([[1, 2], [3, 4]], dtype=np.float32)
+
+    histogram.reset(num_slots=6)
+    # Update in two blocks of rows, like the reduction pass does.
+    histogram.update(slots[:, :1], clim[:, :1], pop[:1], slice(0, 1))
+    histogram.update(slots[:, 1:], clim[:, 1:], pop[1:], slice(1, 2))
+    columns = histogram.columns(time_steps=2)
+
+    expected = {
+        "population_-inf_10": [[2, 0], [3, 0]],
+        "population_10_20": [[3, 0], [0, 4]],
+        "population_20_inf": [[0, 4], [0, 0]],
+    }
+    assert list(columns) == list(expected)
+    for column, values in expected.items():
+        np.testing.assert_array_equal(columns[column], values)
+
+
+def test_population_histogram_exposure_and_quantiles(
+    histogram: reducers.PopulationHistogram,
+) -> None:
+    data = pd.DataFrame(
+        {
+            "location_id": [1, 2, 3],
+            "population_-inf_10": [0.0, 50.0, 0.0],
+            "population_10_20": [100.0, 0.0, 0.0],
+            "population_20_inf": [0.0, 50.0, 0.0],
+        }
+    )
+
+    result = histogram.finalize(data)
+    quantiles = result[QUANTILE_COLUMNS].to_numpy()
+
+    np.testing.assert_array_equal(result.population_ge_10, [100, 50, 0])
+    np.testing.assert_array_equal(result.population_ge_20, [0, 50, 0])
+    # Everyone in location 1 is spread evenly over [10, 20).
+    np.testing.assert_allclose(quantiles[0], [10.5, 12.5, 15.0, 17.5, 19.5])
+    # Open-ended bins are clamped at the outer edges.
+    np.testing.assert_allclose(quantiles[1], [10.0, 10.0, 10.0, 20.0, 20.0])
+    # Quantiles are undefined without population.
+    assert np.isnan(quantiles[2]).all()
+
+
+def test_area_weighted_mean_weights_by_row_area() -> None:
+    # One time step with two locations (slots 1 and 2); slot 0 is outside.
+    slots = np.array([[[1, 1], [2, 0]]], dtype=np.int32)
+    clim = np.array([[[10, np.nan], [30, 99]]], dtype=np.float32)
+    pop = np.zeros((2, 2), dtype=np.float32)
+    reducer = reducers.AreaWeightedMean(np.array([1.0, 3.0]))
+
+    reducer.reset(num_slots=3)
+    reducer.update(slots[:, :1], clim[:, :1], pop[:1], slice(0, 1))
+    reducer.update(slots[:, 1:], clim[:, 1:], pop[1:], slice(1, 2))
+    columns = reducer.columns(time_steps=1)
+
+    # Missing climate doesn't count towards the area.
+    np.testing.assert_array_equal(columns["weighted_climate"], [[10, 90]])
+    np.testing.assert_array_equal(columns["area"], [[1, 3]])
+
+    data = pd.DataFrame({"weighted_climate": [10.0, 90.0], "area": [1.0, 3.0]})
+    result = reducer.finalize(data)
+    assert list(result.columns) == ["area", "value"]
+    np.testing.assert_array_equal(result.value, [10, 30])
+
+
+def test_climate_range_tracks_min_and_max_across_blocks() -> None:
+    # Two time steps of a single row of pixels in slots 0 (outside), 1 and 2,
+    # with runs of repeated values like upsampled climate data has.
+    locations = np.array([[0, 1, 1, 2, 2]], dtype=np.int32)
+    slots = locations + 3 * np.arange(2, dtype=np.int32)[:, None, None]
+    clim = np.array(
+        [[[50, 3, 3, 7, 7]], [[50, 4, 1, np.nan, np.nan]]], dtype=np.float32
+    )
+    pop = np.zeros((1, 5), dtype=np.float32)
+    reducer = reducers.ClimateRange()
+
+    reducer.reset(num_slots=6)
+    reducer.update(slots[..., :3], clim[..., :3], pop[:, :3], slice(0, 1))
+    reducer.update(slots[..., 3:], clim[..., 3:], pop[:, 3:], slice(0, 1))
+    # A later block lowers the minimum of slot 1.
+    reducer.update(slots[..., 1:2], clim[..., 1:2] - 5, pop[:, 1:2], slice(0, 1))
+    columns = reducer.columns(time_steps=2)
+
+    # Slot 2 has no valid data in the second time step.
+    np.testing.assert_array_equal(columns["min"], [[-2.0, 7.0], [-1.0, np.nan]])
+    np.testing.assert_array_equal(columns["max"], [[3.0, 7.0], [4.0, np.nan]])
+
+
+def test_climate_range_ignores_all_missing_block() -> None:
+    reducer = reducers.ClimateRange()
+    reducer.reset(num_slots=2)
+    reducer.update(
+        np.ones((1, 1, 2), dtype=np.int32),
+        np.full((1, 1, 2), np.nan, dtype=np.float32),
+        np.zeros((1, 2), dtype=np.float32),
+        slice(0, 1),
+    )
+    columns = reducer.columns(time_steps=1)
+    assert np.isnan(columns["min"]).all()
+    assert np.isnan(columns["max"]).all()
+
+
+def test_reducer_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        reducers.Reducer()  # type: ignore[abstract]